@@ -6,4 +6,5 @@ from .models import *
 admin.site.register(User)
 admin.site.register(Message)
 admin.site.register(Notification)
-admin.site.register(Invitation)
\ No newline at end of file
+admin.site.register(Invitation)
+admin.site.register(Conversation)
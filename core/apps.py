@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .clients import cloudinary_client
+
+        # CloudinaryField already imports the SDK with the models; this only
+        # applies credentials so profile_pic URLs can be built.
+        cloudinary_client()
@@ -0,0 +1,214 @@
+"""
+Batch API requests: many sub-requests, one round trip.
+
+Sub-requests are dispatched straight to the resolved views with the batch's
+already-authenticated user forced onto them, so the JWT is checked once.
+Runs of consecutive GETs execute concurrently on a small thread pool;
+anything else runs in order on the request thread and acts as a barrier,
+so a GET listed after a write sees it. Sub-requests share an identity map
+(`shared()`), letting views reuse lookups such as the user's friend ids.
+Each sub-request still goes through its view's permissions and throttles
+exactly as if it had been sent on its own.
+"""
+import base64
+import contextvars
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+
+from . import query_log
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+COPIED_META = ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL', 'SCRIPT_NAME', 'wsgi.url_scheme')
+# Conditional and body headers belong to the batch request, not its parts.
+SKIPPED_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH')
+FORWARDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Retry-After', 'Location')
+
+_executor = ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS, thread_name_prefix='api-batch')
+
+
+class InvalidSubRequest(Exception):
+    pass
+
+
+class IdentityMap:
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+        value = loader()
+        with self._lock:
+            return self._values.setdefault(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def shared(request, key, loader):
+    """`loader()`, memoized across the sub-requests of a batch (plain call otherwise)."""
+    identity_map = getattr(request, 'batch_identity_map', None)
+    if identity_map is None:
+        return loader()
+    return identity_map.get_or_load(key, loader)
+
+
+def _validate(spec):
+    if not isinstance(spec, dict):
+        raise InvalidSubRequest('Each request must be an object.')
+    method = str(spec.get('method', 'GET')).upper()
+    if method not in METHODS:
+        raise InvalidSubRequest(f'Unsupported method {method}.')
+    url = urlsplit(str(spec.get('path', '')))
+    if not url.path.startswith('/api/'):
+        raise InvalidSubRequest('path must start with /api/.')
+    headers = spec.get('headers') or {}
+    if not isinstance(headers, dict):
+        raise InvalidSubRequest('headers must be an object.')
+    return method, url, headers
+
+
+def _subrequest(parent, method, url, headers, body):
+    environ = {
+        key: value for key, value in parent.META.items()
+        if key in COPIED_META or (key.startswith('HTTP_') and key not in SKIPPED_HEADERS)
+    }
+    payload = dumps(body) if body is not None else b''
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+    })
+    for name, value in headers.items():
+        key = 'HTTP_' + str(name).upper().replace('-', '_')
+        if key not in ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_HOST'):
+            environ[key] = str(value)
+    return WSGIRequest(environ)
+
+
+def _call(parent, user, identity_map, index, spec):
+    ref = spec.get('id', index)
+    method, url, headers = _validate(spec)
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return {'id': ref, 'status': 404, 'headers': {}, 'content_type': '', 'body': b''}
+    request = _subrequest(parent, method, url, headers, spec.get('body'))
+    # Picked up by DRF's Request: skips re-running JWT authentication.
+    request._force_auth_user = user
+    request.batch_identity_map = identity_map
+    try:
+        with query_log.tagged(query_log.view_name(match.func)):
+            response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+    except Exception:
+        logger.exception('Batch sub-request %s %s failed', method, url.path)
+        return {'id': ref, 'status': 500, 'headers': {}, 'content_type': '', 'body': b''}
+    return {
+        'id': ref,
+        'status': response.status_code,
+        'headers': {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)},
+        'content_type': response.get('Content-Type', ''),
+        'body': body,
+    }
+
+
+def _in_worker(context, *args):
+    close_old_connections()
+    try:
+        if settings.QUERY_LOG_ENABLED:
+            # Connections are per thread: the worker's need their own wrapper.
+            with query_log.recording():
+                return context.run(_call, *args)
+        return context.run(_call, *args)
+    finally:
+        close_old_connections()
+
+
+def execute(parent, user, specs):
+    """Run `specs` and return their results in order."""
+    for spec in specs:
+        _, url, _ = _validate(spec)
+        try:
+            if resolve(url.path).url_name == 'batch':
+                raise InvalidSubRequest('Batches cannot be nested.')
+        except Resolver404:
+            pass
+    identity_map = IdentityMap()
+    results = [None] * len(specs)
+    pending = []
+
+    def flush():
+        if len(pending) == 1:
+            results[pending[0]] = _call(parent, user, identity_map, pending[0], specs[pending[0]])
+            pending.clear()
+            return
+        # Each task gets its own copy of the request's context (e.g. replica routing).
+        futures = [
+            (i, _executor.submit(_in_worker, contextvars.copy_context(), parent, user, identity_map, i, specs[i]))
+            for i in pending
+        ]
+        for i, future in futures:
+            results[i] = future.result()
+        pending.clear()
+
+    for index, spec in enumerate(specs):
+        if str(spec.get('method', 'GET')).upper() == 'GET':
+            pending.append(index)
+            continue
+        flush()
+        # Nothing loaded before a write may be served after it.
+        identity_map.clear()
+        results[index] = _call(parent, user, identity_map, index, spec)
+        identity_map.clear()
+    flush()
+    return results
+
+
+def _text_body(body):
+    try:
+        return dumps(body.decode('utf-8')), None
+    except UnicodeDecodeError:
+        return dumps(base64.b64encode(body).decode('ascii')), 'base64'
+
+
+def encode(results):
+    """
+    {"responses": [...]} with JSON sub-responses spliced in as raw bytes,
+    so nothing is parsed and re-encoded. Text bodies become JSON strings, or
+    base64 flagged with "encoding": "base64" when they aren't UTF-8.
+    """
+    parts = []
+    for result in results:
+        head = {'id': result['id'], 'status': result['status'], 'headers': result['headers']}
+        body = result['body']
+        if not body:
+            body = b'null'
+        elif 'json' not in result['content_type']:
+            if result['content_type'].startswith('text/'):
+                body, encoding = _text_body(body)
+                if encoding:
+                    head['encoding'] = encoding
+            else:
+                body = b'null'
+        parts.append(dumps(head)[:-1] + b',"body":' + body + b'}')
+    return b'{"responses":[' + b','.join(parts) + b']}'
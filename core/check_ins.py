@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from . import recommendations, sync, trending
+from .conditional import bump
+from .models import AttendedEvent
+
+BATCH_RESULT_TTL = 60 * 60 * 24
+# Lookups + inserts tried before a batch that keeps colliding with other gates fails.
+INSERT_ATTEMPTS = 3
+
+
+def _batch_key(scanner_id, batch_id):
+    return f'check-in-batch:{scanner_id}:{batch_id}'
+
+
+def replayed_batch(scanner_id, batch_id):
+    """Result of an offline-queue upload that was already processed, if any."""
+    return cache.get(_batch_key(scanner_id, batch_id)) if batch_id else None
+
+
+def remember_batch(scanner_id, batch_id, result):
+    if batch_id:
+        cache.set(_batch_key(scanner_id, batch_id), result, BATCH_RESULT_TTL)
+
+
+def record_check_ins(scans):
+    """
+    Write validated scans (dicts with user_id, event_id, title, date,
+    image_url, city and optionally attended_at) as AttendedEvent rows.
+
+    Repeats inside the batch are dropped with an in-memory seen-set, rows
+    that already exist are found with one query, and the rest go in with a
+    single bulk_create. If a scan from another gate races in between the
+    lookup and the insert, the (user, event_id) unique constraint fails the
+    insert's savepoint and the lookup is repeated, so only rows this call
+    really inserted are returned and counted. Returns (created rows, number
+    of duplicates).
+    """
+    seen = set()
+    unique = []
+    for scan in scans:
+        pair = (scan['user_id'], scan['event_id'])
+        if pair not in seen:
+            seen.add(pair)
+            unique.append(scan)
+
+    with transaction.atomic():
+        for attempt in range(INSERT_ATTEMPTS):
+            existing = set(
+                AttendedEvent.objects.filter(
+                    user_id__in={user_id for user_id, _ in seen},
+                    event_id__in={event_id for _, event_id in seen},
+                ).values_list('user_id', 'event_id')
+            )
+            new_rows = [
+                AttendedEvent(**scan) for scan in unique
+                if (scan['user_id'], scan['event_id']) not in existing
+            ]
+            try:
+                with transaction.atomic():
+                    AttendedEvent.objects.bulk_create(new_rows, batch_size=500)
+                break
+            except IntegrityError:
+                if attempt == INSERT_ATTEMPTS - 1:
+                    raise
+        if new_rows:
+            # bulk_create sends no post_save: do the signal handlers' work once per batch.
+            trending.record_attendances(new_rows)
+            recommendations.mark_stale(*{row.user_id for row in new_rows})
+            sync.log('attended_events', sync.UPSERT, [(row.user_id, row.event_id) for row in new_rows])
+            transaction.on_commit(lambda: bump('attended_events', *{row.user_id for row in new_rows}))
+
+    return new_rows, len(scans) - len(new_rows)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from . import db_router
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def replicas_need_shared_cache(app_configs, **kwargs):
+    """
+    Read-your-writes pins live in the default cache. In a per-process cache,
+    a client that wrote through one worker can read stale data from a
+    replica through another.
+    """
+    if settings.TESTING or not db_router.replica_aliases():
+        return []
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        "Read replicas are configured but the default cache is local to each process.",
+        hint="Set REDIS_URL so read-your-writes pins are shared by every worker.",
+        id='core.E001',
+    )]
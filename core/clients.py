@@ -0,0 +1,25 @@
+"""
+Lazily initialised third-party SDK clients.
+
+Settings only hold plain values; the SDKs are imported and configured on first
+use so that worker boot and manage.py commands don't pay for integrations most
+requests never touch.
+"""
+import functools
+
+from django.conf import settings
+
+
+@functools.cache
+def cloudinary_client():
+    import cloudinary
+
+    credentials = settings.CLOUDINARY_STORAGE
+    cloudinary.config(
+        cloud_name=credentials['CLOUD_NAME'],
+        api_key=credentials['API_KEY'],
+        api_secret=credentials['API_SECRET'],
+        secure=credentials.get('SECURE', True),
+    )
+    return cloudinary
+
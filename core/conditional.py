@@ -0,0 +1,70 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+# Per-user version stamps for the list endpoints clients poll. Signals in
+# core.signals bump a stamp whenever a row behind that user's resource changes,
+# so an unchanged poll can be answered with 304 from the cache alone.
+
+
+def _key(resource, user_id):
+    return f'version:{resource}:{user_id}'
+
+
+def bump(resource, *user_ids):
+    now = time.time_ns()
+    cache.set_many({_key(resource, user_id): now for user_id in user_ids if user_id}, None)
+
+
+def resource_version(resource, user_id):
+    key = _key(resource, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Unknown or evicted: start a fresh stamp, which forces one full response.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def conditional_get(resource):
+    """
+    Wrap a view's GET handler with ETag / Last-Modified handling driven by the
+    requesting user's version stamp for `resource`. The stamp is read before
+    the handler runs, so a change that lands mid-request is picked up on the
+    next poll rather than hidden behind a 304.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = resource_version(resource, request.user.id)
+            variant = hashlib.md5(request.get_full_path().encode()).hexdigest()[:8]
+            etag = f'W/"{resource}-{version}-{variant}"'
+            # HTTP dates are whole seconds: only a stamp whose second is strictly
+            # older than If-Modified-Since is known to be the client's copy.
+            # Last-Modified names the end of that second once it's over.
+            stamp_second = version // 1_000_000_000
+            last_modified = stamp_second + 1 if time.time() >= stamp_second + 1 else stamp_second
+
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            if if_none_match is not None:
+                not_modified = etag in parse_etags(if_none_match)
+            else:
+                not_modified = if_modified_since is not None and stamp_second < if_modified_since
+
+            if not_modified:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# Reads only go to a replica when ReplicaRoutingMiddleware has cleared them for
+# the current request; management commands, shells and background work stay on
+# the primary.
+_use_replicas = ContextVar('use_replicas', default=False)
+_wrote = ContextVar('db_wrote', default=False)
+
+metrics = Counter()
+
+_lag = {}
+LAG_CHECK_INTERVAL = 10
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary, sampled at most every LAG_CHECK_INTERVAL."""
+    checked_at, lag = _lag.get(alias, (0, 0.0))
+    now = time.monotonic()
+    if now - checked_at < LAG_CHECK_INTERVAL:
+        return lag
+
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        lag = 0.0
+    else:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = float(cursor.fetchone()[0] or 0)
+        except Exception:
+            lag = float('inf')
+    _lag[alias] = (now, lag)
+    return lag
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a healthy replica and everything else to 'default'.
+
+    A replica is skipped while its measured lag is larger than the
+    read-your-writes window, and reads inside a transaction, or after the
+    request has written anything, always use the primary so they see those
+    writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get() or _wrote.get() or connections['default'].in_atomic_block:
+            metrics['reads_primary'] += 1
+            return 'default'
+
+        healthy = [
+            alias for alias in replica_aliases()
+            if replica_lag(alias) <= settings.READ_YOUR_WRITES_SECONDS
+        ]
+        if not healthy:
+            metrics['reads_primary'] += 1
+            return 'default'
+        alias = random.choice(healthy)
+        metrics['reads_replica'] += 1
+        metrics[f'reads_{alias}'] += 1
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        metrics['writes'] += 1
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def snapshot():
+    return {
+        'counters': dict(metrics),
+        'replica_lag': {alias: _lag.get(alias, (0, None))[1] for alias in replica_aliases()},
+        'read_your_writes_seconds': settings.READ_YOUR_WRITES_SECONDS,
+    }
@@ -0,0 +1,176 @@
+"""
+Personalized event suggestions, computed offline.
+
+AttendedEvent and WishListEvent rows form a weighted user-by-event matrix R.
+Item-item cosine similarity (R.T @ R, normalized) is computed in chunks of
+events sized so the gathered co-occurrences stay under CHUNK_BUDGET entries,
+keeping only each event's NEIGHBOURS_PER_EVENT most similar events. Users are
+then scored in blocks against those neighbour lists and blended with what
+their friends attend or wishlist. The top EVENT_RECOMMENDATIONS_PER_USER rows
+per user land in EventRecommendation, so serving them is one indexed read.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import AttendedEvent, EventRecommendation, Friendship, WishListEvent
+from .recommendations import SparseRows, top_per_owner
+
+ATTEND_WEIGHT = 2.0
+WISHLIST_WEIGHT = 1.0
+NEIGHBOURS_PER_EVENT = 50
+# Each friend who engaged with an event is worth this much of the user's
+# single best similarity score.
+FRIEND_ACTIVITY_WEIGHT = 0.25
+CHUNK_BUDGET = 2_000_000
+USER_BLOCK_SIZE = 2000
+
+DETAIL_FIELDS = ('event_id', 'title', 'date', 'image_url', 'city')
+
+
+def _upcoming(date, today):
+    try:
+        day = parse_date((date or '')[:10])
+    except ValueError:
+        day = None
+    # Free-form dates we can't read are kept rather than guessed at.
+    return day is None or day >= today
+
+
+class Interactions:
+    def __init__(self):
+        user_ids, event_keys, weights = [], [], []
+        self.details = {}
+        # Wishlist first so attended rows win when both describe an event.
+        for model, weight in ((WishListEvent, WISHLIST_WEIGHT), (AttendedEvent, ATTEND_WEIGHT)):
+            for user_id, *detail in model.objects.values_list('user_id', *DETAIL_FIELDS).iterator(chunk_size=10000):
+                user_ids.append(user_id)
+                event_keys.append(detail[0])
+                weights.append(weight)
+                self.details[detail[0]] = detail
+        pairs = np.array(list(Friendship.objects.values_list('user1_id', 'user2_id')), dtype=np.int64).reshape(-1, 2)
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+
+        self.user_ids, user_index = np.unique(
+            np.concatenate([np.array(user_ids, dtype=np.int64), pairs.ravel()]), return_inverse=True,
+        )
+        self.event_ids, event_index = np.unique(np.array(event_keys, dtype=object), return_inverse=True)
+        self.n_users, self.n_events = len(self.user_ids), len(self.event_ids)
+        today = timezone.localdate()
+        self.upcoming = np.array(
+            [_upcoming(self.details[event_id][2], today) for event_id in self.event_ids], dtype=bool,
+        )
+
+        # Attending and wishlisting the same event counts once, at the higher weight.
+        keys, inverse = np.unique(user_index[:len(user_ids)] * self.n_events + event_index, return_inverse=True)
+        strength = np.zeros(len(keys))
+        np.maximum.at(strength, inverse, np.array(weights))
+        users, events = np.divmod(keys, self.n_events)
+
+        self.by_user = SparseRows(users, events, self.n_users, strength)
+        self.by_event = SparseRows(events, users, self.n_events, strength)
+        self.norms = np.sqrt(np.bincount(events, weights=strength ** 2, minlength=self.n_events))
+        friend_a, friend_b = user_index[len(user_ids):].reshape(-1, 2).T
+        self.friends = SparseRows(
+            np.concatenate([friend_a, friend_b]), np.concatenate([friend_b, friend_a]), self.n_users,
+        )
+
+    def neighbours(self):
+        """Each event's most similar events by cosine similarity, as a SparseRows."""
+        # Gathered entries per event: its attendees' full histories.
+        owners = np.repeat(np.arange(self.n_events), self.by_event.row_lengths(np.arange(self.n_events)))
+        work = np.bincount(
+            owners, weights=self.by_user.row_lengths(self.by_event.indices), minlength=self.n_events,
+        )
+        cumulative = np.cumsum(work)
+
+        sources, targets, similarity = [], [], []
+        start = 0
+        while start < self.n_events:
+            done = cumulative[start - 1] if start else 0
+            end = max(int(np.searchsorted(cumulative, done + CHUNK_BUDGET, side='right')), start + 1)
+            chunk = np.arange(start, min(end, self.n_events))
+            start = chunk[-1] + 1
+
+            users, owner, first = self.by_event.gather_values(chunk)
+            others, via, second = self.by_user.gather_values(users)
+            keys, inverse = np.unique(chunk[owner[via]] * self.n_events + others, return_inverse=True)
+            dots = np.bincount(inverse, weights=first[via] * second, minlength=len(keys))
+            source, target = np.divmod(keys, self.n_events)
+            keep = source != target
+            source, target, dots = source[keep], target[keep], dots[keep]
+            cosine = dots / (self.norms[source] * self.norms[target])
+            best = top_per_owner(source, cosine, NEIGHBOURS_PER_EVENT)
+            sources.append(source[best])
+            targets.append(target[best])
+            similarity.append(cosine[best])
+
+        if not sources:
+            empty = np.empty(0, dtype=np.int64)
+            return SparseRows(empty, empty, self.n_events, np.empty(0))
+        return SparseRows(np.concatenate(sources), np.concatenate(targets), self.n_events, np.concatenate(similarity))
+
+    def suggestions(self, block, neighbours, limit):
+        """
+        Yield (user_id, event_id, score, reason, friend_count) for the best
+        `limit` events of every user in `block` (dense indexes).
+        """
+        n = self.n_events
+        seen, seen_owner, strength = self.by_user.gather_values(block)
+        similar, via, similarity = neighbours.gather_values(seen)
+        similar_keys = block[seen_owner[via]] * n + similar
+
+        friends, friend_owner = self.friends.gather(block)
+        friend_events, via_friend = self.by_user.gather(friends)
+        friend_keys = block[friend_owner[via_friend]] * n + friend_events
+
+        keys, inverse = np.unique(np.concatenate([similar_keys, friend_keys]), return_inverse=True)
+        affinity = np.bincount(inverse[:len(similar_keys)], weights=strength[via] * similarity, minlength=len(keys))
+        friend_count = np.bincount(inverse[len(similar_keys):], minlength=len(keys))
+
+        owners, events = np.divmod(keys, n)
+        keep = ~np.isin(keys, block[seen_owner] * n + seen) & self.upcoming[events]
+        keys, owners, events = keys[keep], owners[keep], events[keep]
+        affinity, friend_count = affinity[keep], friend_count[keep]
+
+        # Scale similarity to [0, 1] per user so friend activity blends in evenly.
+        best = np.zeros(self.n_users)
+        np.maximum.at(best, owners, affinity)
+        affinity = np.divide(affinity, best[owners], out=np.zeros_like(affinity), where=best[owners] > 0)
+        social = FRIEND_ACTIVITY_WEIGHT * friend_count
+        scores = affinity + social
+
+        for i in top_per_owner(owners, scores, limit):
+            yield (
+                int(self.user_ids[owners[i]]), self.event_ids[events[i]], float(scores[i]),
+                'friends' if social[i] > affinity[i] else 'similar', int(friend_count[i]),
+            )
+
+
+def refresh(limit=None):
+    """Recompute every user's suggestions; returns how many users have rows."""
+    limit = limit or settings.EVENT_RECOMMENDATIONS_PER_USER
+    started = timezone.now()
+    data = Interactions()
+    neighbours = data.neighbours()
+
+    users = 0
+    for start in range(0, data.n_users, USER_BLOCK_SIZE):
+        block = np.arange(start, min(start + USER_BLOCK_SIZE, data.n_users))
+        rows = []
+        for user_id, event_id, score, reason, friend_count in data.suggestions(block, neighbours, limit):
+            _, title, date, image_url, city = data.details[event_id]
+            rows.append(EventRecommendation(
+                user_id=user_id, event_id=event_id, title=title, date=date, image_url=image_url,
+                city=city, score=score, reason=reason, friend_count=friend_count,
+            ))
+        with transaction.atomic():
+            EventRecommendation.objects.filter(user_id__in=data.user_ids[block].tolist()).delete()
+            EventRecommendation.objects.bulk_create(rows, batch_size=1000)
+        users += len({row.user_id for row in rows})
+
+    # Users who dropped out of the data entirely.
+    EventRecommendation.objects.filter(computed_at__lt=started).delete()
+    return users
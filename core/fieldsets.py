@@ -0,0 +1,106 @@
+"""
+Sparse fieldsets: ?fields=id,username / ?exclude=email on list and detail reads.
+
+SparseFieldsetMixin drops the unrequested fields from a serializer, and
+prune() narrows the queryset feeding it to the columns those fields read
+(`only()`), joining in the related rows they traverse (`select_related`).
+A field whose source can't be mapped to model columns (a method field
+with no entry in Meta.sparse_sources, or a property) leaves the queryset
+unpruned rather than risk a query per row for deferred columns.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(request, param):
+    value = request.query_params.get(param) if hasattr(request, 'query_params') else request.GET.get(param)
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested(request):
+    """(fields, exclude) asked for by the request; empty sets mean no restriction."""
+    if request is None or request.method not in SAFE_METHODS:
+        return set(), set()
+    return _names(request, 'fields'), _names(request, 'exclude')
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin honouring ?fields= and ?exclude= from the request in
+    its context. Unknown names are ignored. Writes are never narrowed.
+    Method fields list the model attributes they read in Meta.sparse_sources
+    so prune() can still narrow the queryset for them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, exclude = requested(self.context.get('request'))
+        for name in list(self.fields):
+            if (fields and name not in fields) or name in exclude:
+                self.fields.pop(name)
+
+
+def _columns(model, source, related):
+    """
+    Model paths `source` ('sender.username') reads, recording the relations
+    it walks in `related`; None when it isn't a chain of model fields.
+    """
+    parts = source.split('.')
+    path = []
+    for i, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        path.append(field.name)
+        if not field.is_relation:
+            return '__'.join(path) if i == len(parts) - 1 else None
+        if not (field.many_to_one or field.one_to_one) or not field.concrete:
+            return None
+        if i == len(parts) - 1:
+            # The foreign key value itself.
+            return '__'.join(path)
+        related.add('__'.join(path))
+        model = field.related_model
+    return '__'.join(path)
+
+
+def prune(queryset, serializer_class, request):
+    """
+    `queryset` narrowed to what `serializer_class` will render for
+    `request`: only() the columns behind the requested fields and
+    select_related the relations they traverse. Unchanged when nothing was
+    excluded or a field can't be mapped.
+    """
+    fields, exclude = requested(request)
+    if not fields and not exclude:
+        return queryset
+    serializer = serializer_class(context={'request': request})
+    declared = getattr(serializer.Meta, 'sparse_sources', {})
+    columns, related = set(), set()
+    for name, field in serializer.fields.items():
+        if name in declared:
+            sources = declared[name]
+        elif field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            return queryset
+        else:
+            sources = [field.source]
+        for source in sources:
+            if isinstance(field, serializers.BaseSerializer):
+                # A nested serializer needs the whole related row.
+                relation = _columns(queryset.model, source, set())
+                if relation is None:
+                    return queryset
+                related.add(relation)
+                continue
+            column = _columns(queryset.model, source, related)
+            if column is None:
+                return queryset
+            columns.add(column)
+    # Join only what is still read; a traversed relation must not be deferred.
+    columns |= related
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
@@ -0,0 +1,122 @@
+"""
+Set-based friend-request and invitation responses.
+
+Each function handles any number of ids in one transaction with a fixed
+number of queries: lock the pending rows, look up existing friendships
+once, then bulk_create / update / delete. Responding twice is safe: ids
+that were already handled are reported, not re-processed, and the
+duplicate-friendship check keeps a retry from creating a second row.
+bulk_create and update() send no post_save, so the version stamps,
+recommendation queue and sync change log are updated here directly.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import recommendations, sync
+from .conditional import bump
+from .models import FriendRequest, Friendship, Invitation, Notification
+
+MAX_BATCH = 500
+
+
+def _friend_ids(user, other_ids):
+    pairs = Friendship.objects.filter(
+        Q(user1=user, user2_id__in=other_ids) | Q(user1_id__in=other_ids, user2=user)
+    ).values_list('user1_id', 'user2_id')
+    return {user2_id if user1_id == user.id else user1_id for user1_id, user2_id in pairs}
+
+
+def befriend(user, other_ids):
+    """Create missing friendships between `user` and `other_ids`; returns the ids that were new."""
+    new_ids = set(other_ids) - _friend_ids(user, other_ids)
+    Friendship.objects.bulk_create(
+        [Friendship(user1_id=other_id, user2=user) for other_id in sorted(new_ids)],
+        ignore_conflicts=True,
+    )
+    if new_ids:
+        recommendations.mark_stale(user.id, *new_ids)
+        sync.log('friends', sync.UPSERT, [(user.id, other_id) for other_id in new_ids] + [(other_id, user.id) for other_id in new_ids])
+        transaction.on_commit(lambda: bump('friends', user.id, *new_ids))
+    return new_ids
+
+
+@transaction.atomic
+def accept_friend_requests(user, sender_ids):
+    sender_ids = set(sender_ids)
+    pending = dict(
+        FriendRequest.objects.select_for_update()
+        .filter(receiver=user, sender_id__in=sender_ids, status='pending')
+        .values_list('sender_id', 'id')
+    )
+    accepted = set(pending)
+    if accepted:
+        befriend(user, accepted)
+        FriendRequest.objects.filter(id__in=pending.values()).delete()
+        Notification.objects.filter(recipient=user, sender_id__in=accepted, type='friend_request').delete()
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=sender_id,
+                sender=user,
+                type='friend_request_accepted',
+                content=f"{user.username} accepted your friend request.",
+            )
+            for sender_id in sorted(accepted)
+        ])
+        sync.log('notifications', sync.UPSERT, [(n.recipient_id, n.pk) for n in notifications])
+        transaction.on_commit(lambda: bump('notifications', *accepted))
+
+    already_friends = _friend_ids(user, sender_ids - accepted) if sender_ids - accepted else set()
+    return {
+        'accepted': sorted(accepted),
+        'already_friends': sorted(already_friends),
+        'not_found': sorted(sender_ids - accepted - already_friends),
+    }
+
+
+@transaction.atomic
+def reject_friend_requests(user, sender_ids):
+    sender_ids = set(sender_ids)
+    pending = dict(
+        FriendRequest.objects.select_for_update()
+        .filter(receiver=user, sender_id__in=sender_ids, status='pending')
+        .values_list('sender_id', 'id')
+    )
+    rejected = set(pending)
+    if rejected:
+        FriendRequest.objects.filter(id__in=pending.values()).delete()
+        Notification.objects.filter(recipient=user, sender_id__in=rejected, type='friend_request').delete()
+    return {
+        'rejected': sorted(rejected),
+        'not_found': sorted(sender_ids - rejected),
+    }
+
+
+@transaction.atomic
+def respond_to_invitations(user, invitation_ids, action):
+    """`action` is 'accept' or 'ignore', as in InvitationUpdateView."""
+    new_status = 'accepted' if action == 'accept' else 'ignored'
+    invitation_ids = set(invitation_ids)
+    rows = list(
+        Invitation.objects.select_for_update()
+        .filter(receiver=user, id__in=invitation_ids)
+        .values_list('id', 'sender_id', 'status')
+    )
+    pending = {invitation_id: sender_id for invitation_id, sender_id, status in rows if status == 'pending'}
+    if pending:
+        Invitation.objects.filter(id__in=pending).update(status=new_status, updated_at=timezone.now())
+        if action == 'accept':
+            befriend(user, set(pending.values()))
+        senders = set(pending.values())
+        sync.log('invitations', sync.UPSERT, [
+            (party, invitation_id) for invitation_id, sender_id in pending.items() for party in (user.id, sender_id)
+        ])
+        transaction.on_commit(lambda: bump('invitations', user.id, *senders))
+
+    return {
+        new_status: sorted(pending),
+        # Responded to before: unchanged when the status matches, a conflict otherwise.
+        'unchanged': sorted(i for i, _, status in rows if status == new_status),
+        'already_responded': sorted(i for i, _, status in rows if status not in ('pending', new_status)),
+        'not_found': sorted(invitation_ids - {i for i, _, _ in rows}),
+    }
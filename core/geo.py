@@ -0,0 +1,95 @@
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 9
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            bits, ch = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(lat degrees, lng degrees) covered by one geohash cell."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng); longitude bounds are None when the box wraps the antimeridian."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180 or max_lng > 180:
+        min_lng = max_lng = None
+    return max(lat - dlat, -90.0), min(lat + dlat, 90.0), min_lng, max_lng
+
+
+def covering_cells(lat, lng, radius_km):
+    """
+    Geohash prefixes whose cells together cover the search circle: the
+    center cell plus its eight neighbours at the finest precision whose cell
+    is still at least as large as the radius. Empty when the radius is so
+    large that only a bounding-box scan makes sense.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    precision = 0
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = cell_size(p)
+        if cell_lat >= dlat and cell_lng >= dlng:
+            precision = p
+            break
+    if not precision:
+        return []
+
+    cell_lat, cell_lng = cell_size(precision)
+    cells = set()
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            n_lat = min(max(lat + i * cell_lat, -90.0), 90.0)
+            n_lng = (lng + j * cell_lng + 180.0) % 360.0 - 180.0
+            cells.add(encode(n_lat, n_lng, precision))
+    return sorted(cells)
+
+
+def prefix_range(prefix):
+    """
+    [start, stop) bounds matching every geohash that starts with `prefix`,
+    so the lookup is a plain B-tree range scan on any backend or collation
+    (unlike LIKE 'prefix%'). `stop` is None when there is no successor.
+    """
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return prefix, ''.join(chars)
+        chars.pop()
+    return prefix, None
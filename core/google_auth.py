@@ -0,0 +1,111 @@
+import re
+import threading
+import time
+
+import jwt
+import requests
+from django.core.cache import cache
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+GOOGLE_ISSUERS = ['accounts.google.com', 'https://accounts.google.com']
+
+JWKS_CACHE_KEY = 'google-jwks'
+REFRESH_LOCK_KEY = 'google-jwks-refreshing'
+DEFAULT_MAX_AGE = 3600
+# Start a background refresh once this fraction of the max-age has passed.
+REFRESH_AHEAD = 0.8
+# Unknown kids force at most one synchronous refetch per this many seconds.
+UNKNOWN_KID_COOLDOWN = 30
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens locally against Google's signing keys.
+
+    The JWKS document lives in the shared cache keyed by `kid` for as long as
+    Google's Cache-Control max-age allows and is refreshed in a background
+    thread before it expires, so a steady-state login is a cache read plus an
+    RS256 signature check. Parsed keys are kept per process to skip re-parsing.
+    Tests can call `install_keys()` with a local JWKS instead of hitting Google.
+    """
+
+    def __init__(self, certs_url=GOOGLE_CERTS_URL):
+        self.certs_url = certs_url
+        self.session = requests.Session()
+        self._parsed = {}
+        self._parsed_from = None
+        self._last_forced = 0.0
+
+    def install_keys(self, jwks, max_age=DEFAULT_MAX_AGE):
+        now = time.time()
+        entry = {
+            'keys': {jwk['kid']: jwk for jwk in jwks['keys']},
+            'fetched_at': now,
+            'expires_at': now + max_age,
+        }
+        cache.set(JWKS_CACHE_KEY, entry, max_age)
+        return entry
+
+    def refresh(self):
+        response = self.session.get(self.certs_url, timeout=5)
+        response.raise_for_status()
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        return self.install_keys(response.json(), int(match.group(1)) if match else DEFAULT_MAX_AGE)
+
+    def _refresh_in_background(self):
+        if not cache.add(REFRESH_LOCK_KEY, True, 60):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except requests.RequestException:
+                pass
+            finally:
+                cache.delete(REFRESH_LOCK_KEY)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _entry(self):
+        entry = cache.get(JWKS_CACHE_KEY)
+        if entry is None:
+            return self.refresh()
+        lifetime = entry['expires_at'] - entry['fetched_at']
+        if time.time() > entry['fetched_at'] + lifetime * REFRESH_AHEAD:
+            self._refresh_in_background()
+        return entry
+
+    def _public_key(self, kid):
+        entry = self._entry()
+        if kid not in entry['keys'] and time.monotonic() - self._last_forced > UNKNOWN_KID_COOLDOWN:
+            # Google rotated its keys before our copy expired.
+            self._last_forced = time.monotonic()
+            entry = self.refresh()
+        if kid not in entry['keys']:
+            raise ValueError('Unknown Google signing key.')
+
+        # Parsed keys are only reused while they come from the same JWKS document.
+        if self._parsed_from != entry['fetched_at']:
+            self._parsed = {}
+            self._parsed_from = entry['fetched_at']
+        if kid not in self._parsed:
+            self._parsed[kid] = jwt.PyJWK(entry['keys'][kid]).key
+        return self._parsed[kid]
+
+    def verify(self, token, audience):
+        """Return the token's claims; raise ValueError if it is not a valid Google ID token."""
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+            return jwt.decode(
+                token,
+                self._public_key(kid),
+                algorithms=['RS256'],
+                audience=audience,
+                issuer=GOOGLE_ISSUERS,
+                leeway=10,
+            )
+        except (jwt.PyJWTError, requests.RequestException) as exc:
+            raise ValueError(str(exc)) from exc
+
+
+google_verifier = GoogleTokenVerifier()
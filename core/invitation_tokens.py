@@ -0,0 +1,92 @@
+import hashlib
+import io
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+SALT = 'core.invitation'
+
+
+class InvalidInvitationToken(Exception):
+    pass
+
+
+def _token_key(invitation_id):
+    return f'invitation-token:{invitation_id}'
+
+
+def _nonce_key(nonce):
+    return f'invitation-nonce:{nonce}'
+
+
+def _qr_key(digest):
+    return f'invitation-qr:{digest}'
+
+
+def issue(invitation):
+    """
+    Signed, expiring token for a pending invitation. The payload carries the
+    invitation, sender and receiver ids plus a one-time nonce, so a scan can
+    be validated without reading the invitations table. The same token is
+    handed out again until it expires so its QR image stays cached.
+    """
+    key = _token_key(invitation.id)
+    token = cache.get(key)
+    if token is None:
+        payload = [invitation.id, invitation.sender_id, invitation.receiver_id, secrets.token_urlsafe(9)]
+        token = signing.dumps(payload, salt=SALT, compress=True)
+        # Stop re-issuing a little early so a handed-out token is never about to lapse.
+        if not cache.add(key, token, int(settings.INVITATION_TOKEN_MAX_AGE * 0.9)):
+            token = cache.get(key, token)
+    return token
+
+
+def verify(token):
+    """Return (invitation_id, sender_id, receiver_id, nonce) or raise InvalidInvitationToken."""
+    try:
+        invitation_id, sender_id, receiver_id, nonce = signing.loads(
+            token, salt=SALT, max_age=settings.INVITATION_TOKEN_MAX_AGE,
+        )
+    except signing.SignatureExpired:
+        raise InvalidInvitationToken('Invitation code has expired.')
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidInvitationToken('Invalid invitation code.')
+    return invitation_id, sender_id, receiver_id, nonce
+
+
+def consume(invitation_id, nonce):
+    """
+    Mark a token as used. The nonce only has to be remembered until the
+    token would have expired anyway; returns False if it was already used.
+    This is a fast path only: with a per-process cache a replay on another
+    worker gets through, and the scan's conditional UPDATE of the pending
+    invitation is what stops it.
+    """
+    if not cache.add(_nonce_key(nonce), True, settings.INVITATION_TOKEN_MAX_AGE):
+        return False
+    cache.delete(_token_key(invitation_id))
+    return True
+
+
+def qr_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def qr_png(token):
+    """
+    Render the token's QR code once and keep it under its content hash. A
+    miss (another worker's cache, an eviction) just renders it again.
+    """
+    digest = qr_digest(token)
+    key = _qr_key(digest)
+    png = cache.get(key)
+    if png is None:
+        import segno
+
+        buffer = io.BytesIO()
+        segno.make(token, error='m').save(buffer, kind='png', scale=8, border=2)
+        png = buffer.getvalue()
+        cache.set(key, png, settings.INVITATION_TOKEN_MAX_AGE)
+    return digest, png
@@ -0,0 +1,48 @@
+import timeit
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONRenderer, stream_json_list
+
+
+def notification_rows(n):
+    now = datetime(2025, 8, 1, 12, 0, tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
+    return [{
+        'id': i,
+        'type': 'friend_request',
+        'content': f"user{i} sent you a friend request.",
+        'is_read': bool(i % 2),
+        'timestamp': now,
+        'sender_id': i,
+        'sender_name': f"user{i}",
+        'recipient_id': 1,
+        'recipient_name': "me",
+    } for i in range(n)]
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSONRenderer with the orjson and streaming renderers on list payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 20000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, rows, repeat, **options):
+        drf, fast = JSONRenderer(), ORJSONRenderer()
+        self.stdout.write(f"{'rows':>8} {'JSONRenderer':>14} {'ORJSONRenderer':>15} {'streaming':>11} {'speedup':>8}")
+
+        for n in rows:
+            data = notification_rows(n)
+            assert drf.render(data) == fast.render(data)
+            assert b''.join(stream_json_list(iter(data), list).streaming_content) == drf.render(data)
+
+            t_drf = min(timeit.repeat(lambda: drf.render(data), number=1, repeat=repeat))
+            t_fast = min(timeit.repeat(lambda: fast.render(data), number=1, repeat=repeat))
+            t_stream = min(timeit.repeat(
+                lambda: b''.join(stream_json_list(iter(data), list).streaming_content), number=1, repeat=repeat
+            ))
+            self.stdout.write(
+                f"{n:>8} {t_drf * 1e3:>12.3f}ms {t_fast * 1e3:>13.3f}ms {t_stream * 1e3:>9.3f}ms {t_drf / t_fast:>7.1f}x"
+            )
@@ -0,0 +1,62 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import AttendedEvent
+from core.renderers import dumps
+from core.row_mappers import FRIEND_EVENT
+from core.serializers import FriendEventSerializer
+
+User = get_user_model()
+
+
+def via_serializer(queryset):
+    # What FriendEventsAPIView did: model instances, copied to dicts, then serialized.
+    data = [{
+        "id": event.event_id,
+        "name": event.title,
+        "date": event.date,
+        "image_url": event.image_url
+    } for event in queryset]
+    return FriendEventSerializer(data, many=True).data
+
+
+def via_mapper(queryset):
+    return FRIEND_EVENT(FRIEND_EVENT.values(queryset))
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-row cost of building friend-event payloads through model instances and "
+        "FriendEventSerializer versus values_list() and a RowMapper. Rows are created "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, rows, repeat, **options):
+        self.stdout.write(f"{'rows':>8} {'serializer':>14} {'row mapper':>14} {'speedup':>8}")
+        with transaction.atomic():
+            user = User.objects.create(username='row-mapper-bench', email='row-mapper-bench@example.com')
+            AttendedEvent.objects.bulk_create([
+                AttendedEvent(
+                    user=user, event_id=f'bench-{i}', title=f"Bench event {i}", date='2026-01-01',
+                    image_url=f'https://example.com/{i}.jpg', city='Nairobi',
+                )
+                for i in range(max(rows))
+            ], batch_size=1000)
+
+            for n in rows:
+                events = AttendedEvent.objects.filter(user=user).order_by('event_id')[:n]
+                assert dumps(via_serializer(events)) == dumps(via_mapper(events))
+
+                t_before = min(timeit.repeat(lambda: via_serializer(events), number=1, repeat=repeat))
+                t_after = min(timeit.repeat(lambda: via_mapper(events), number=1, repeat=repeat))
+                self.stdout.write(
+                    f"{n:>8} {t_before / n * 1e6:>11.2f}us/row {t_after / n * 1e6:>11.2f}us/row {t_before / t_after:>7.1f}x"
+                )
+            transaction.set_rollback(True)
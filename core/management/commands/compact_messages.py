@@ -0,0 +1,78 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import Conversation, Message, MessageArchive
+from core.serializers import MessageSerializer
+
+
+class Command(BaseCommand):
+    help = "Move messages older than the retention window into compressed monthly archive blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=180)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, retention_days, dry_run, **options):
+        # Only whole months are compacted so each (conversation, month) archive is written once.
+        cutoff = (timezone.now() - timedelta(days=retention_days)).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        archived = blobs = 0
+
+        for conversation in Conversation.objects.filter(last_message_at__isnull=False).iterator():
+            low, high = conversation.user_low_id, conversation.user_high_id
+            old = list(Message.objects.filter(
+                (Q(sender_id=low) & Q(receiver_id=high)) | (Q(sender_id=high) & Q(receiver_id=low)),
+                timestamp__lt=cutoff,
+            ).order_by('id'))
+            if not old:
+                continue
+
+            for month, rows in groupby(old, key=lambda m: m.timestamp.date().replace(day=1)):
+                rows = list(rows)
+                archived += len(rows)
+                blobs += 1
+                if not dry_run:
+                    self.archive_month(conversation, month, rows)
+
+        verb = "Would archive" if dry_run else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {archived} messages into {blobs} monthly blobs (cutoff {cutoff:%Y-%m-%d})."
+        ))
+
+    @transaction.atomic
+    def archive_month(self, conversation, month, rows):
+        entries = MessageSerializer(rows, many=True).data
+        archive = MessageArchive.objects.select_for_update().filter(conversation=conversation, month=month).first()
+        if archive:
+            entries = archive.messages() + list(entries)
+        else:
+            archive = MessageArchive(conversation=conversation, month=month)
+
+        archive.payload = MessageArchive.pack(entries)
+        archive.message_count = len(entries)
+        archive.first_message_id = entries[0]['id']
+        archive.last_message_id = entries[-1]['id']
+        archive.save()
+
+        # A raw delete: nothing references Message, and the sync change log's
+        # post_delete receiver must not tell clients to drop history that is
+        # still readable from the archive (collecting for it would also load
+        # every row one by one).
+        doomed = Message.objects.filter(id__in=[m.id for m in rows])
+        doomed._raw_delete(doomed.db)
+
+        # Archived messages can no longer be marked read, so they leave the unread counters.
+        unread_low = sum(1 for m in rows if not m.is_read and m.receiver_id == conversation.user_low_id)
+        unread_high = sum(1 for m in rows if not m.is_read and m.receiver_id == conversation.user_high_id)
+        if unread_low or unread_high:
+            Conversation.objects.filter(pk=conversation.pk).update(
+                unread_low=Greatest(F('unread_low') - unread_low, 0),
+                unread_high=Greatest(F('unread_high') - unread_high, 0),
+            )
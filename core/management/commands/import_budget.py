@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BOOT = "import django; django.setup(); import importlib; importlib.import_module({urlconf!r})"
+
+
+class Command(BaseCommand):
+    help = (
+        "Import settings, every app and the URLconf in a fresh interpreter under "
+        "`python -X importtime`, report the most expensive modules and fail when "
+        "the total exceeds IMPORT_TIME_BUDGET_MS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=int, default=settings.IMPORT_TIME_BUDGET_MS)
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, budget_ms, top, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT.format(urlconf=settings.ROOT_URLCONF)],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE']},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Boot failed:\n{result.stderr[-2000:]}")
+
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+        total_ms = sum(self_us for _, self_us, _ in modules) / 1000
+        by_package = defaultdict(int)
+        for name, self_us, _ in modules:
+            by_package[name.split('.')[0]] += self_us
+
+        self.stdout.write(f"Top {top} modules by cumulative import time:")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)[:top]:
+            self.stdout.write(f"  {cumulative_us / 1000:9.1f}ms  (self {self_us / 1000:7.1f}ms)  {name}")
+
+        self.stdout.write(f"Top {top} top-level packages by self time:")
+        for package, self_us in sorted(by_package.items(), key=lambda p: p[1], reverse=True)[:top]:
+            self.stdout.write(f"  {self_us / 1000:9.1f}ms  {package}")
+
+        summary = f"Total import time {total_ms:.1f}ms across {len(modules)} modules (budget {budget_ms}ms)."
+        if total_ms > budget_ms:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
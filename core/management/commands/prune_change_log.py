@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete delta-sync change log entries older than CHANGE_LOG_RETENTION_DAYS. "
+        "Clients holding older versions get a full snapshot on their next sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+        deleted = 0
+        while True:
+            ids = list(
+                ChangeLogEntry.objects.filter(created_at__lt=cutoff)
+                .order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            deleted += ChangeLogEntry.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} change log entries."))
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import trending
+from core.models import AttendedEvent, EventTrend, WishListEvent
+
+FIELDS = ('event_id', 'city', 'title', 'date', 'image_url')
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute trending scores from every AttendedEvent and WishListEvent row, "
+        "replacing the incrementally maintained counters, and rebuild the cached leaderboards."
+    )
+
+    def handle(self, *args, **options):
+        trends = {}
+
+        def add(row, weight, when, attended, wishlisted):
+            increment = trending.log_weight(weight, when)
+            for city in {trending.GLOBAL, trending.normalize_city(row['city'])}:
+                trend = trends.get((row['event_id'], city))
+                if trend is None:
+                    trends[(row['event_id'], city)] = EventTrend(
+                        event_id=row['event_id'], city=city, title=row['title'], date=row['date'],
+                        image_url=row['image_url'], log_score=increment,
+                        attended_count=attended, wishlist_count=wishlisted,
+                    )
+                else:
+                    trend.log_score = trending.log_add(trend.log_score, increment)
+                    trend.attended_count += attended
+                    trend.wishlist_count += wishlisted
+
+        for row in AttendedEvent.objects.values(*FIELDS, 'attended_at').iterator(chunk_size=5000):
+            add(row, trending.ATTEND_WEIGHT, row['attended_at'], 1, 0)
+        for row in WishListEvent.objects.values(*FIELDS, 'added_at').iterator(chunk_size=5000):
+            added = datetime.combine(row['added_at'], time(12), tzinfo=dt_timezone.utc)
+            add(row, trending.WISHLIST_WEIGHT, added, 0, 1)
+
+        with transaction.atomic():
+            EventTrend.objects.all().delete()
+            EventTrend.objects.bulk_create(trends.values(), batch_size=1000)
+
+        cities = {city for _, city in trends} | {trending.GLOBAL}
+        for city in cities:
+            trending.rebuild_leaderboard(city)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(trends)} event trends across {len(cities)} leaderboards."
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import event_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild personalized event suggestions from attendance, wishlists and "
+        "friends' activity. Meant to run periodically, e.g. nightly."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = event_recommendations.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored event recommendations for {users} users in {time.perf_counter() - started:.2f}s."
+        ))
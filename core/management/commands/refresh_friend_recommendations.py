@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute \"people you may know\" for users whose friendships or attended events "
+        "changed since the last run (or for everyone with --all)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute every user, not just the queued ones.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            refreshed = recommendations.refresh()
+        else:
+            refreshed = recommendations.refresh_stale()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed friend recommendations for {refreshed} users in {time.perf_counter() - started:.2f}s."
+        ))
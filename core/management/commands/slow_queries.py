@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from core.models import QueryStat
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'mean': '-mean_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+    'slow': '-slow_calls',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank query fingerprints recorded by the slow-query log, with the view that "
+        "issued them and the captured EXPLAIN plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help="Look at this many hours of stats.")
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--sort', choices=sorted(ORDERINGS), default='total')
+        parser.add_argument('--view', default='', help="Only queries issued by views whose name contains this.")
+        parser.add_argument('--explain', action='store_true', help="Print the captured plan under each query.")
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Delete stats older than QUERY_LOG_RETENTION_DAYS instead of reporting.",
+        )
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            cutoff = timezone.now() - timedelta(days=settings.QUERY_LOG_RETENTION_DAYS)
+            deleted = QueryStat.objects.filter(recorded_at__lt=cutoff).delete()[0]
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} query stats."))
+            return
+
+        since = timezone.now() - timedelta(hours=options['hours'])
+        stats = QueryStat.objects.filter(recorded_at__gte=since)
+        if options['view']:
+            stats = stats.filter(view__icontains=options['view'])
+        rows = list(
+            stats.values('fingerprint', 'view')
+            .annotate(calls=Sum('calls'), total_ms=Sum('total_ms'), max_ms=Max('max_ms'), slow_calls=Sum('slow_calls'))
+        )
+        for row in rows:
+            row['mean_ms'] = row['total_ms'] / row['calls']
+        key = ORDERINGS[options['sort']]
+        rows.sort(key=lambda row: row[key.lstrip('-')], reverse=True)
+        rows = rows[:options['limit']]
+        if not rows:
+            self.stdout.write("No queries recorded in that window.")
+            return
+
+        # Latest statement and non-empty plan per fingerprint.
+        details = {}
+        for fingerprint, statement, explain in (
+            stats.filter(fingerprint__in={row['fingerprint'] for row in rows})
+            .order_by('recorded_at').values_list('fingerprint', 'statement', 'explain')
+        ):
+            previous = details.get(fingerprint, ('', ''))[1]
+            details[fingerprint] = (statement, explain or previous)
+
+        for rank, row in enumerate(rows, 1):
+            statement, explain = details[row['fingerprint']]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{rank}. {row['fingerprint']}  {row['view'] or '(outside a view)'}"
+            ))
+            self.stdout.write(
+                f"   calls={row['calls']}  total={row['total_ms']:.1f}ms  mean={row['mean_ms']:.2f}ms  "
+                f"max={row['max_ms']:.1f}ms  slow={row['slow_calls']}"
+            )
+            self.stdout.write(f"   {statement}")
+            if options['explain'] and explain:
+                for line in explain.splitlines():
+                    self.stdout.write(f"     | {line}")
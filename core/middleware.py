@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import logging
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import db_router, profiling, query_log
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfilerMiddleware:
+    """
+    Profiles requests that send `X-Profile: <PROFILER_TOKEN>`, plus a random
+    PROFILER_SAMPLE_RATE share of all others, with core.profiling. The
+    response names the capture in an X-Profile-Id header. Streamed bodies
+    are produced after the view returns and aren't covered.
+
+    With no token and a zero rate the middleware is left out of the stack
+    entirely, so a disabled profiler costs nothing.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_TOKEN and settings.PROFILER_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+
+        profile = profiling.Profile().start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        try:
+            response['X-Profile-Id'] = profiling.save(profile, request, response)
+        except OSError:
+            logger.exception('Could not save profile of %s', request.path)
+        return response
+
+    @staticmethod
+    def wanted(request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token and settings.PROFILER_TOKEN:
+            return hmac.compare_digest(token.encode(), settings.PROFILER_TOKEN.encode())
+        return random.random() < settings.PROFILER_SAMPLE_RATE
+
+
+class QueryLogMiddleware:
+    """
+    Feeds every query a request runs into core.query_log, tagged with the
+    view that handled it, and flushes the aggregates when they are due.
+    Left out of the stack when QUERY_LOG_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with query_log.recording(), query_log.tagged(''):
+            response = self.get_response(request)
+        query_log.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        query_log.set_view(query_log.view_name(view_func))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests read from replicas, except for clients that wrote
+    something within the last READ_YOUR_WRITES_SECONDS: those stay pinned to
+    the primary so they always see their own changes.
+
+    Clients are told apart by their Authorization header (JWT auth runs later,
+    inside the view) and fall back to the remote address.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not db_router.replica_aliases():
+            return self.get_response(request)
+
+        pin_key = self.pin_key(request)
+        use_replicas = request.method in SAFE_METHODS and not cache.get(pin_key)
+        if request.method in SAFE_METHODS and not use_replicas:
+            db_router.metrics['pinned_requests'] += 1
+
+        use_token = db_router._use_replicas.set(use_replicas)
+        wrote_token = db_router._wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if db_router._wrote.get():
+                cache.set(pin_key, True, settings.READ_YOUR_WRITES_SECONDS)
+        finally:
+            db_router._use_replicas.reset(use_token)
+            db_router._wrote.reset(wrote_token)
+        return response
+
+    @staticmethod
+    def pin_key(request):
+        credential = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+        return 'db-pin:' + hashlib.sha1(credential.encode()).hexdigest()
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('core', 'Message')
+    Conversation = apps.get_model('core', 'Conversation')
+
+    summaries = {}
+    for m in Message.objects.order_by('timestamp').iterator():
+        low, high = sorted((m.sender_id, m.receiver_id))
+        row = summaries.setdefault((low, high), Conversation(user_low_id=low, user_high_id=high))
+        row.last_sender_id = m.sender_id
+        row.last_message_preview = m.content[:100]
+        row.last_message_at = m.timestamp
+        if not m.is_read:
+            if m.receiver_id == low:
+                row.unread_low += 1
+            else:
+                row.unread_high += 1
+    Conversation.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_remove_notification_user_notification_recipient_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, max_length=255)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_low', models.PositiveIntegerField(default=0)),
+                ('unread_high', models.PositiveIntegerField(default=0)),
+                ('last_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations_high', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations_low', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_low', '-last_message_at'], name='conversation_low_recent'), models.Index(fields=['user_high', '-last_message_at'], name='conversation_high_recent')],
+                'unique_together': {('user_low', 'user_high')},
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
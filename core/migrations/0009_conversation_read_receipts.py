@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_read_high',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_read_low',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_conversation_read_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('first_message_id', models.PositiveBigIntegerField()),
+                ('last_message_id', models.PositiveBigIntegerField()),
+                ('payload', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'timestamp'], name='message_pair_time'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['timestamp'], name='message_time'),
+        ),
+        migrations.AddField(
+            model_name='messagearchive',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='core.conversation'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='messagearchive',
+            unique_together={('conversation', 'month')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['geohash', 'date'], name='event_geohash_date'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_public', 'date'], name='event_public_date'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_event_geo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendedevent',
+            name='city',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='wishlistevent',
+            name='city',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='EventTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('title', models.CharField(max_length=255)),
+                ('date', models.CharField(max_length=255)),
+                ('image_url', models.URLField()),
+                ('log_score', models.FloatField(default=0.0)),
+                ('attended_count', models.PositiveIntegerField(default=0)),
+                ('wishlist_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['city', '-log_score'], name='trend_city_score')],
+                'unique_together': {('event_id', 'city')},
+            },
+        ),
+    ]
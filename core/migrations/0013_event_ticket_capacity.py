@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_event_trends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='ticket_capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_attendance(apps, schema_editor):
+    AttendedEvent = apps.get_model('core', 'AttendedEvent')
+
+    # Keep the earliest row of every (user, event_id) pair.
+    duplicates = (
+        AttendedEvent.objects.values('user_id', 'event_id')
+        .annotate(first_id=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for pair in duplicates.iterator():
+        AttendedEvent.objects.filter(user_id=pair['user_id'], event_id=pair['event_id']).exclude(
+            id=pair['first_id'],
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_event_ticket_capacity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendedevent',
+            name='attended_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(drop_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendedevent',
+            constraint=models.UniqueConstraint(fields=('user', 'event_id'), name='attended_event_unique_user_event'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_friend_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=255)),
+                ('date', models.CharField(max_length=255)),
+                ('image_url', models.URLField()),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('score', models.FloatField()),
+                ('reason', models.CharField(choices=[('similar', 'Similar to events you like'), ('friends', 'Popular with your friends')], max_length=10)),
+                ('friend_count', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score'], name='event_rec_user_score')],
+                'unique_together': {('user', 'event_id')},
+            },
+        ),
+    ]
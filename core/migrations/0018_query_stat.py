@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=16)),
+                ('view', models.CharField(blank=True, max_length=200)),
+                ('statement', models.TextField()),
+                ('calls', models.PositiveIntegerField()),
+                ('total_ms', models.FloatField()),
+                ('max_ms', models.FloatField()),
+                ('slow_calls', models.PositiveIntegerField(default=0)),
+                ('explain', models.TextField(blank=True)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recorded_at'], name='querystat_recorded')],
+            },
+        ),
+    ]
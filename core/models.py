@@ -1,4 +1,12 @@
+import json
+import zlib
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import geo
 from django.contrib.auth.models import AbstractUser
 from cloudinary.models import CloudinaryField
 
@@ -41,6 +49,7 @@ class WishListEvent(models.Model):
     title = models.CharField(max_length=255)
     date = models.CharField(max_length=255)
     image_url = models.URLField()
+    city = models.CharField(max_length=100, blank=True)
     added_at = models.DateField(auto_now_add=True)
 
     def __str__(self):
@@ -53,7 +62,14 @@ class AttendedEvent(models.Model):
     title = models.CharField(max_length=255)
     date = models.CharField(max_length=100)
     image_url = models.URLField()
-    attended_at = models.DateTimeField(auto_now_add=True)
+    city = models.CharField(max_length=100, blank=True)
+    # A default rather than auto_now_add so offline gate scans keep their scan time.
+    attended_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event_id'], name='attended_event_unique_user_event'),
+        ]
 
     def __str__(self):
         return f"AttendedEvent: {self.title} for user {self.user.username}"
@@ -66,6 +82,12 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='message_pair_time'),
+            models.Index(fields=['timestamp'], name='message_time'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender} to {self.receiver} at {self.timestamp}"
 
@@ -86,15 +108,36 @@ class Event(models.Model):
     description = models.TextField()
     date = models.DateTimeField()
     location = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude on save; prefix lookups on it are the spatial index.
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     image = models.ImageField(upload_to='event_images/', null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events')
     is_public = models.BooleanField(default=True)
     ticket_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Null means the event does not sell tickets through us.
+    ticket_capacity = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['geohash', 'date'], name='event_geohash_date'),
+            models.Index(fields=['is_public', 'date'], name='event_public_date'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'geohash'}
+        super().save(*args, **kwargs)
+
  
 class Invitation(models.Model):
     STATUS_CHOICES = [
@@ -107,4 +150,277 @@ class Invitation(models.Model):
     receiver = models.ForeignKey(User, related_name='received_invitations', on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+
+class Conversation(models.Model):
+    # The pair is stored ordered (user_low.id < user_high.id) so each friendship
+    # has exactly one row no matter who sent the first message.
+    user_low = models.ForeignKey(User, related_name='conversations_low', on_delete=models.CASCADE)
+    user_high = models.ForeignKey(User, related_name='conversations_high', on_delete=models.CASCADE)
+    last_sender = models.ForeignKey(User, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    last_message_preview = models.CharField(max_length=255, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_low = models.PositiveIntegerField(default=0)
+    unread_high = models.PositiveIntegerField(default=0)
+    # Id of the newest message each participant has read, so the other side can
+    # render read receipts without touching the Message table.
+    last_read_low = models.PositiveBigIntegerField(default=0)
+    last_read_high = models.PositiveBigIntegerField(default=0)
+
+    PREVIEW_LENGTH = 100
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+        indexes = [
+            models.Index(fields=['user_low', '-last_message_at'], name='conversation_low_recent'),
+            models.Index(fields=['user_high', '-last_message_at'], name='conversation_high_recent'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_low} and {self.user_high}"
+
+    @staticmethod
+    def pair(a_id, b_id):
+        return (a_id, b_id) if a_id < b_id else (b_id, a_id)
+
+    @classmethod
+    def between(cls, a, b):
+        low, high = cls.pair(a.id, b.id)
+        return cls.objects.filter(user_low_id=low, user_high_id=high)
+
+    @staticmethod
+    def unread_field(user_id, low_id):
+        return 'unread_low' if user_id == low_id else 'unread_high'
+
+    def other(self, user):
+        return self.user_high if user.id == self.user_low_id else self.user_low
+
+    def unread_for(self, user):
+        return self.unread_low if user.id == self.user_low_id else self.unread_high
+
+    def read_up_to_by(self, user):
+        return self.last_read_low if user.id == self.user_low_id else self.last_read_high
+
+    def mark_read(self, user, up_to):
+        """
+        Flip every unread message the other participant sent to `user` with
+        id <= up_to in one UPDATE, and move the cached counter by the same
+        amount. The ids are read first so the sync change log can name them.
+        Returns the number of messages marked read.
+        """
+        from . import sync
+
+        side = 'low' if user.id == self.user_low_id else 'high'
+        friend_id = self.user_high_id if side == 'low' else self.user_low_id
+        ids = list(Message.objects.filter(
+            sender_id=friend_id, receiver_id=user.id, is_read=False, id__lte=up_to
+        ).values_list('id', flat=True))
+        flipped = Message.objects.filter(id__in=ids, is_read=False).update(is_read=True)
+        # update() sends no post_save: tell both sides' sync clients directly.
+        sync.log('messages', sync.UPSERT, [(party, message_id) for message_id in ids for party in (user.id, friend_id)])
+        Conversation.objects.filter(pk=self.pk).update(**{
+            f'unread_{side}': Greatest(models.F(f'unread_{side}') - flipped, 0),
+            f'last_read_{side}': Greatest(models.F(f'last_read_{side}'), up_to),
+        })
+        return flipped
+
+    @classmethod
+    def record_message(cls, message):
+        """Fold a new message into the pair's summary row with a single UPDATE."""
+        low, high = cls.pair(message.sender_id, message.receiver_id)
+        conversation, _ = cls.objects.get_or_create(user_low_id=low, user_high_id=high)
+        unread = cls.unread_field(message.receiver_id, low)
+        cls.objects.filter(pk=conversation.pk).update(
+            last_sender_id=message.sender_id,
+            last_message_preview=message.content[:cls.PREVIEW_LENGTH],
+            last_message_at=message.timestamp,
+            **{unread: models.F(unread) + 1},
+        )
+
+
+class MessageArchive(models.Model):
+    """
+    One calendar month of a conversation's history, compacted out of the
+    Message table by `manage.py compact_messages` into a zlib-compressed JSON
+    blob. Each entry is the MessageSerializer output of the original row, so
+    the history endpoint can return archived and live messages side by side.
+    """
+    conversation = models.ForeignKey(Conversation, related_name='archives', on_delete=models.CASCADE)
+    month = models.DateField()
+    message_count = models.PositiveIntegerField(default=0)
+    first_message_id = models.PositiveBigIntegerField()
+    last_message_id = models.PositiveBigIntegerField()
+    payload = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    CACHE_SECONDS = 60 * 60 * 24
+
+    class Meta:
+        unique_together = ('conversation', 'month')
+
+    def __str__(self):
+        return f"Archive of {self.conversation} for {self.month:%Y-%m}"
+
+    @staticmethod
+    def pack(messages):
+        return zlib.compress(json.dumps(messages, separators=(',', ':')).encode(), 9)
+
+    def messages(self):
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+    def cached_messages(self):
+        """
+        messages(), decoded once per cache lifetime. The key names the id
+        range and count, which change whenever compact_messages appends to the
+        month, so a stale decode is never served. Load archives with
+        defer('payload'): the blob is only fetched on a miss.
+        """
+        key = f'message-archive:{self.id}:{self.last_message_id}:{self.message_count}'
+        messages = cache.get(key)
+        if messages is None:
+            messages = self.messages()
+            cache.set(key, messages, self.CACHE_SECONDS)
+        return messages
+
+
+class EventTrend(models.Model):
+    """
+    Time-decayed popularity of one event, globally (city='') and per city.
+
+    `log_score` is a forward-decayed score kept in log space: every
+    engagement adds weight * exp(lambda * (t - TRENDING_EPOCH)), so rows never
+    need to be re-decayed and ordering by log_score is ordering by current
+    popularity. See core.trending.
+    """
+    event_id = models.CharField(max_length=100)
+    city = models.CharField(max_length=100, blank=True)
+    title = models.CharField(max_length=255)
+    date = models.CharField(max_length=255)
+    image_url = models.URLField()
+    log_score = models.FloatField(default=0.0)
+    attended_count = models.PositiveIntegerField(default=0)
+    wishlist_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('event_id', 'city')
+        indexes = [
+            models.Index(fields=['city', '-log_score'], name='trend_city_score'),
+        ]
+
+    def __str__(self):
+        return f"Trend for {self.title} in {self.city or 'all cities'}"
+
+
+class FriendRecommendation(models.Model):
+    """
+    Precomputed "people you may know" rows, the top FRIEND_RECOMMENDATIONS_PER_USER
+    candidates per user. Written by core.recommendations, read by the endpoint.
+    """
+    user = models.ForeignKey(User, related_name='friend_recommendations', on_delete=models.CASCADE)
+    candidate = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    mutual_friends = models.PositiveIntegerField(default=0)
+    shared_events = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'candidate')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='friend_rec_user_score'),
+        ]
+
+    def __str__(self):
+        return f"Recommend {self.candidate} to {self.user}"
+
+
+class RecommendationRefresh(models.Model):
+    # Users whose friends or attended events changed since their
+    # recommendations were last computed.
+    user = models.OneToOneField(User, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    requested_at = models.DateTimeField(auto_now=True)
+
+
+class EventRecommendation(models.Model):
+    """
+    Precomputed personalized suggestions, the top EVENT_RECOMMENDATIONS_PER_USER
+    per user, blending item-item similarity with friends' activity.
+    Written by core.event_recommendations, read by the endpoint.
+    """
+    REASON_CHOICES = [
+        ('similar', 'Similar to events you like'),
+        ('friends', 'Popular with your friends'),
+    ]
+
+    user = models.ForeignKey(User, related_name='event_recommendations', on_delete=models.CASCADE)
+    event_id = models.CharField(max_length=100)
+    title = models.CharField(max_length=255)
+    date = models.CharField(max_length=255)
+    image_url = models.URLField()
+    city = models.CharField(max_length=100, blank=True)
+    score = models.FloatField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    friend_count = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'event_id')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='event_rec_user_score'),
+        ]
+
+    def __str__(self):
+        return f"Recommend {self.title} to {self.user}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only per-user change log behind the delta sync endpoint. The id
+    is the version: a client that has seen up to id N asks for everything
+    after N. Entries only name the changed object; payloads are read at sync
+    time so repeated changes to one object cost one row in the response.
+    """
+    OP_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE, db_index=False)
+    resource = models.CharField(max_length=20)
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    object_id = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_version'),
+            models.Index(fields=['created_at'], name='changelog_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.op} {self.resource}:{self.object_id} for user {self.user_id}"
+
+
+class QueryStat(models.Model):
+    """
+    One worker's totals for one query fingerprint and view over one flush
+    window of core.query_log. `manage.py slow_queries` sums the windows.
+    """
+    fingerprint = models.CharField(max_length=16)
+    view = models.CharField(max_length=200, blank=True)
+    statement = models.TextField()
+    calls = models.PositiveIntegerField()
+    total_ms = models.FloatField()
+    max_ms = models.FloatField()
+    slow_calls = models.PositiveIntegerField(default=0)
+    # Plan of the first slow call in the window, if there was one.
+    explain = models.TextField(blank=True)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at'], name='querystat_recorded'),
+        ]
+
+    def __str__(self):
+        return f"{self.fingerprint} in {self.view or '-'}: {self.calls} calls"
@@ -0,0 +1,207 @@
+"""
+On-demand sampling profiler for individual requests.
+
+While at least one request is being profiled, a single daemon thread wakes
+every INTERVAL seconds, reads the stacks of the profiled threads from
+sys._current_frames() and counts them. Nothing is hooked into the
+interpreter, so a profiled request runs at close to full speed and the rest
+are untouched. Finished profiles are written to a ring of files under
+PROFILER_DIR: collapsed stacks (`<name>.folded`, the input format of
+flamegraph.pl and speedscope), a rendered `<name>.svg` flamegraph and a
+`<name>.json` summary. Only the newest PROFILER_RING_SIZE are kept.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from html import escape
+from pathlib import Path
+
+from django.conf import settings
+
+INTERVAL = 0.005
+MAX_DEPTH = 128
+
+_lock = threading.Lock()
+_active = {}  # thread id -> Counter of collapsed stacks
+_wake = threading.Event()
+_sampler = None
+_labels = {}
+
+
+def _label(code, module):
+    key = (code, module)
+    label = _labels.get(key)
+    if label is None:
+        label = _labels[key] = f'{module}:{code.co_qualname}'
+    return label
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame.f_code, frame.f_globals.get('__name__', '?')))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _sample_forever():
+    while True:
+        _wake.wait()
+        frames = sys._current_frames()
+        with _lock:
+            for thread_id, stacks in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+            if not _active:
+                _wake.clear()
+        del frames
+        time.sleep(INTERVAL)
+
+
+def _ensure_sampler():
+    global _sampler
+    with _lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_forever, name='request-profiler', daemon=True)
+            _sampler.start()
+
+
+class Profile:
+    """Samples the calling thread between start() and stop()."""
+
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.started = self.elapsed = None
+
+    def start(self):
+        _ensure_sampler()
+        self.started = time.perf_counter()
+        with _lock:
+            _active[self.thread_id] = self.stacks
+            _wake.set()
+        return self
+
+    def stop(self):
+        with _lock:
+            _active.pop(self.thread_id, None)
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+
+def folded(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def _tree(stacks):
+    root = {'name': 'all', 'count': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'name': name, 'count': 0, 'children': {}})
+            node['count'] += count
+    return root
+
+
+def flamegraph(stacks, title, width=1200, row=16):
+    """A self-contained SVG flamegraph (root at the bottom) of collapsed `stacks`."""
+    root = _tree(stacks)
+    total = root['count'] or 1
+    boxes = []
+    depth = 0
+
+    def place(node, x, level):
+        nonlocal depth
+        depth = max(depth, level)
+        boxes.append((node, x, level))
+        for child in sorted(node['children'].values(), key=lambda child: child['name']):
+            place(child, x, level + 1)
+            x += child['count']
+
+    place(root, 0, 0)
+    scale = width / total
+    height = (depth + 1) * row + 2 * row
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="{row - 4}">{escape(title)}</text>',
+    ]
+    for node, x, level in boxes:
+        w = node['count'] * scale
+        if w < 0.5:
+            continue
+        y = height - (level + 1) * row
+        hue = zlib.crc32(node['name'].encode()) % 50
+        share = 100 * node['count'] / total
+        tooltip = escape(f"{node['name']} ({node['count']} samples, {share:.1f}%)")
+        text = escape(node['name'][:int(w / 7)]) if w > 21 else ''
+        parts.append(
+            f'<g><title>{tooltip}</title>'
+            f'<rect x="{x * scale:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" fill="hsl({hue},85%,60%)"/>'
+            f'<text x="{x * scale + 2:.1f}" y="{y + row - 4}">{text}</text></g>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def directory():
+    return Path(settings.PROFILER_DIR)
+
+
+def _write(path, content):
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_text(content)
+    os.replace(tmp, path)
+
+
+def save(profile, request, response):
+    """Write `profile` to the ring and return its name."""
+    # Names sort by capture time, so trimming the ring drops the oldest.
+    name = f'{time.time_ns() // 1_000_000}-{uuid.uuid4().hex[:8]}'
+    samples = sum(profile.stacks.values())
+    meta = {
+        'name': name,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(profile.elapsed * 1000, 2),
+        'samples': samples,
+        'interval_ms': INTERVAL * 1000,
+        'captured_at': time.time(),
+    }
+    folder = directory()
+    folder.mkdir(parents=True, exist_ok=True)
+    _write(folder / f'{name}.folded', folded(profile.stacks))
+    _write(folder / f'{name}.svg', flamegraph(
+        profile.stacks, f"{meta['method']} {meta['path']} - {meta['duration_ms']} ms, {samples} samples",
+    ))
+    # The summary goes last: listings only show profiles whose files are all there.
+    _write(folder / f'{name}.json', json.dumps(meta))
+    _trim(folder)
+    return name
+
+
+def _trim(folder):
+    names = sorted(path.stem for path in folder.glob('*.json'))
+    for name in names[:max(len(names) - settings.PROFILER_RING_SIZE, 0)]:
+        for suffix in ('.json', '.svg', '.folded'):
+            (folder / f'{name}{suffix}').unlink(missing_ok=True)
+
+
+def captured():
+    """Summaries of the profiles in the ring, newest first."""
+    profiles = []
+    for path in sorted(directory().glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Trimmed (or half written) under us.
+            continue
+    return profiles
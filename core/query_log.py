@@ -0,0 +1,152 @@
+"""
+Slow-query log: per-fingerprint query counts and timings, with plans.
+
+Inside recording(), every query on every database connection of the
+current thread passes through an execute_wrapper. The wrapper times the
+query and folds it into an in-process aggregate, keyed by the SQL's
+fingerprint and the view that issued it. The fingerprint is the statement
+with literals, placeholders and IN / VALUES lists collapsed. The first
+query of a fingerprint slower than QUERY_LOG_SLOW_MS in each window also
+has its EXPLAIN plan captured. Every QUERY_LOG_FLUSH_SECONDS the aggregates
+are appended to QueryStat with one bulk insert, so
+`manage.py slow_queries` can rank them across all workers.
+"""
+import contextlib
+import functools
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_view = ContextVar('query_log_view', default='')
+_suspended = ContextVar('query_log_suspended', default=False)
+
+_lock = threading.Lock()
+_stats = {}
+_last_flush = time.monotonic()
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """(fingerprint, normalized statement) for `sql`."""
+    statement = _LITERALS.sub('?', sql)
+    statement = _LISTS.sub('(...)', statement)
+    statement = _ROWS.sub('(...)', statement)
+    statement = _SPACE.sub(' ', statement).strip()
+    return hashlib.sha1(statement.encode()).hexdigest()[:16], statement
+
+
+def _explain(connection, sql, params):
+    if sql.lstrip()[:6].upper() != 'SELECT':
+        return ''
+    token = _suspended.set(True)
+    try:
+        # A savepoint inside transactions, so a failed EXPLAIN can't break the caller's.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError:
+        return ''
+    finally:
+        _suspended.reset(token)
+
+
+def _wrapper(execute, sql, params, many, context):
+    if _suspended.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = execute(sql, params, many, context)
+        failed = False
+        return result
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        key, statement = fingerprint(sql)
+        slow = elapsed_ms >= settings.QUERY_LOG_SLOW_MS
+        with _lock:
+            stat = _stats.get((key, _view.get()))
+            if stat is None:
+                stat = _stats[(key, _view.get())] = {
+                    'statement': statement, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow_calls': 0, 'explain': None,
+                }
+            stat['calls'] += 1
+            stat['total_ms'] += elapsed_ms
+            stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+            stat['slow_calls'] += slow
+            explain = slow and not failed and not many and stat['explain'] is None
+            if explain:
+                stat['explain'] = ''
+        if explain:
+            stat['explain'] = _explain(context['connection'], sql, params)
+
+
+@contextlib.contextmanager
+def recording():
+    """Log the queries this thread runs until the block exits."""
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_wrapper))
+        yield
+
+
+def view_name(view_func):
+    view = getattr(view_func, 'view_class', view_func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def set_view(name):
+    """Attribute the current context's queries to `name` from here on."""
+    _view.set(name)
+
+
+@contextlib.contextmanager
+def tagged(name):
+    """Attribute the block's queries to `name`."""
+    token = _view.set(name)
+    try:
+        yield
+    finally:
+        _view.reset(token)
+
+
+def flush(force=False):
+    """Append the aggregates collected since the last flush to QueryStat, if due."""
+    global _stats, _last_flush
+    from .models import QueryStat
+
+    with _lock:
+        if not _stats or (not force and time.monotonic() - _last_flush < settings.QUERY_LOG_FLUSH_SECONDS):
+            return 0
+        stats, _stats = _stats, {}
+        _last_flush = time.monotonic()
+    rows = [
+        QueryStat(
+            fingerprint=key, view=view[:200], statement=stat['statement'], calls=stat['calls'],
+            total_ms=stat['total_ms'], max_ms=stat['max_ms'], slow_calls=stat['slow_calls'],
+            explain=stat['explain'] or '',
+        )
+        for (key, view), stat in stats.items()
+    ]
+    token = _suspended.set(True)
+    try:
+        # Explicitly on the primary: the router would pin the client to it otherwise.
+        QueryStat.objects.using('default').bulk_create(rows, batch_size=500)
+    except DatabaseError:
+        logger.exception('Could not save %d query stats', len(rows))
+        return 0
+    finally:
+        _suspended.reset(token)
+    return len(rows)
@@ -0,0 +1,135 @@
+import math
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+
+DETAIL = 'detail'
+SEARCH = 'search'
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} quota exhausted, retry in {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class QuotaGovernor:
+    """
+    Meters outbound calls to one upstream provider against its per-second and
+    per-day quota, using counters in the shared cache so every worker draws
+    from the same budget.
+
+    A slice of both budgets is held back for detail lookups: broad searches
+    stop at `per_second - reserved` calls a second, so a burst of searches
+    can never starve event detail pages. When the second's budget is gone a
+    caller waits for the next second (up to `max_wait`) before giving up.
+    """
+
+    def __init__(self, provider, per_second, per_day, detail_reserve=0.2, max_wait=1.0):
+        self.provider = provider
+        self.per_second = per_second
+        self.per_day = per_day
+        self.detail_reserve = detail_reserve
+        self.max_wait = max_wait
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def _key(self, *parts):
+        return ':'.join(['quota', self.provider, *map(str, parts)])
+
+    def _limits(self, priority):
+        if priority == DETAIL:
+            return self.per_second, self.per_day
+        second_reserve = math.ceil(self.per_second * self.detail_reserve)
+        day_reserve = math.ceil(self.per_day * self.detail_reserve)
+        return max(1, self.per_second - second_reserve), max(1, self.per_day - day_reserve)
+
+    def _take(self, key, limit, timeout):
+        self.cache.add(key, 0, timeout)
+        try:
+            used = self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout)
+            used = 1
+        if used > limit:
+            self.cache.decr(key)
+            return False
+        return True
+
+    def _release(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+    def acquire(self, priority=SEARCH):
+        """Take one call from the budget or raise QuotaExceeded."""
+        second_limit, day_limit = self._limits(priority)
+        deadline = time.monotonic() + self.max_wait
+
+        while True:
+            blocked_until = self.cache.get(self._key('blocked'))
+            now = time.time()
+            if blocked_until and blocked_until > now:
+                raise QuotaExceeded(self.provider, math.ceil(blocked_until - now))
+
+            second_key = self._key('s', int(now))
+            if self._take(second_key, second_limit, 2):
+                day = int(now // 86400)
+                if self._take(self._key('d', day), day_limit, 86400 + 60):
+                    return
+                self._release(second_key)
+                raise QuotaExceeded(self.provider, math.ceil((day + 1) * 86400 - now))
+
+            wait = math.ceil(now) - now or 1.0
+            if time.monotonic() + wait > deadline:
+                raise QuotaExceeded(self.provider, 1)
+            time.sleep(wait)
+
+    def penalize(self, retry_after=1):
+        """Stop all calls for a while after the provider itself answered 429."""
+        self.cache.set(self._key('blocked'), time.time() + retry_after, retry_after)
+
+    def remaining(self):
+        now = time.time()
+        second_key = self._key('s', int(now))
+        day_key = self._key('d', int(now // 86400))
+        used = self.cache.get_many([second_key, day_key])
+        return {
+            'provider': self.provider,
+            'second': max(0, self.per_second - used.get(second_key, 0)),
+            'day': max(0, self.per_day - used.get(day_key, 0)),
+            'per_second': self.per_second,
+            'per_day': self.per_day,
+        }
+
+
+_governors = {}
+
+
+def get_governor(provider):
+    if provider not in _governors:
+        _governors[provider] = QuotaGovernor(provider, **settings.UPSTREAM_QUOTAS[provider])
+    return _governors[provider]
+
+
+def governed_get(provider, url, priority=SEARCH, **kwargs):
+    """
+    requests.get() that draws from the provider's quota first. If the provider
+    answers 429 anyway the whole pool backs off and the caller gets
+    QuotaExceeded instead of the upstream error.
+    """
+    governor = get_governor(provider)
+    governor.acquire(priority)
+    response = requests.get(url, **kwargs)
+    if response.status_code == 429:
+        retry_after = response.headers.get('Retry-After', '')
+        retry_after = int(retry_after) if retry_after.isdigit() else 1
+        governor.penalize(retry_after)
+        raise QuotaExceeded(provider, retry_after)
+    return response
@@ -0,0 +1,229 @@
+"""
+"People you may know": candidates are scored by mutual friends and
+co-attended events.
+
+The friendship graph and the attendance table are loaded once into
+CSR-style NumPy arrays (row pointers + column indices); an incremental run
+loads only the two-hop neighbourhood of the users it refreshes. Scoring a block of
+users is then a sparse product done with array gathers: a user's friends'
+friend lists give mutual-friend counts (the block's rows of F @ F), and the
+attendee lists of their events give shared-event counts (rows of A @ A.T).
+No per-pair ORM queries, and nothing quadratic in the number of users.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AttendedEvent, FriendRecommendation, Friendship, RecommendationRefresh
+
+MUTUAL_FRIEND_WEIGHT = 1.0
+SHARED_EVENT_WEIGHT = 0.5
+BLOCK_SIZE = 2000
+# Sharing a stadium concert says little about knowing someone, and the
+# attendee lists of huge events would dominate the product's size.
+MAX_SHARED_EVENT_SIZE = 1000
+# Past this many users within one hop of the targets, reading the whole graph
+# is about as cheap as the neighbourhood, and its IN lists stay small.
+MAX_NEIGHBOURHOOD = 20000
+
+
+class SparseRows:
+    """
+    Row-compressed matrix: row i's columns are indices[indptr[i]:indptr[i + 1]],
+    with matching `values` when weights are given (0/1 otherwise).
+    """
+
+    def __init__(self, rows, cols, n_rows, values=None):
+        order = np.argsort(rows, kind='stable')
+        self.indices = cols[order]
+        self.values = values[order] if values is not None else None
+        self.indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=self.indptr[1:])
+
+    def row_lengths(self, row_ids):
+        return self.indptr[row_ids + 1] - self.indptr[row_ids]
+
+    def _positions(self, row_ids):
+        starts = self.indptr[row_ids]
+        lengths = self.indptr[row_ids + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        owners = np.repeat(np.arange(len(row_ids)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets, owners
+
+    def gather(self, row_ids):
+        """
+        Concatenated columns of `row_ids` and, for each, the position in
+        `row_ids` it came from.
+        """
+        positions, owners = self._positions(row_ids)
+        return self.indices[positions], owners
+
+    def gather_values(self, row_ids):
+        positions, owners = self._positions(row_ids)
+        return self.indices[positions], owners, self.values[positions]
+
+
+def top_per_owner(owners, scores, limit):
+    """Indexes of the best `limit` scores for every owner, best first within each owner."""
+    order = np.lexsort((-scores, owners))
+    sorted_owners = owners[order]
+    group_start = np.flatnonzero(np.r_[True, sorted_owners[1:] != sorted_owners[:-1]])
+    rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+    return order[rank < limit]
+
+
+class Graph:
+    """
+    The friendship and attendance graph, or with `user_ids` just the part
+    needed to score those users: every friendship of them and their friends,
+    and every attendance of the events they attended. Rows of other users
+    may then be incomplete, so only `user_ids` can be scored.
+    """
+
+    def __init__(self, user_ids=None):
+        friendships = Friendship.objects.all()
+        attendance = AttendedEvent.objects.all()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            nearby = set(user_ids)
+            for pair in Friendship.objects.filter(
+                Q(user1_id__in=user_ids) | Q(user2_id__in=user_ids)
+            ).values_list('user1_id', 'user2_id'):
+                nearby.update(pair)
+            if len(nearby) <= MAX_NEIGHBOURHOOD:
+                friendships = friendships.filter(Q(user1_id__in=nearby) | Q(user2_id__in=nearby))
+                attendance = attendance.filter(
+                    event_id__in=AttendedEvent.objects.filter(user_id__in=user_ids).values('event_id'),
+                )
+
+        pairs = np.array(list(friendships.values_list('user1_id', 'user2_id')), dtype=np.int64).reshape(-1, 2)
+        # A friendship may have been stored in both directions.
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        attended = list(attendance.values_list('user_id', 'event_id').iterator(chunk_size=10000))
+        attendees = np.array([user_id for user_id, _ in attended], dtype=np.int64)
+        event_keys = np.array([event_id for _, event_id in attended], dtype=object)
+
+        # Dense indexes for users and events that appear anywhere in the graph.
+        self.user_ids, user_index = np.unique(np.concatenate([pairs.ravel(), attendees]), return_inverse=True)
+        n_users = len(self.user_ids)
+        friend_a, friend_b = user_index[:len(pairs) * 2].reshape(-1, 2).T
+        attendee_index = user_index[len(pairs) * 2:]
+        if len(event_keys):
+            _, event_index, sizes = np.unique(event_keys, return_inverse=True, return_counts=True)
+            n_events = len(sizes)
+            small = sizes[event_index] <= MAX_SHARED_EVENT_SIZE
+            attendee_index, event_index = attendee_index[small], event_index[small]
+        else:
+            event_index, n_events = np.empty(0, dtype=np.int64), 0
+
+        self.friends = SparseRows(np.concatenate([friend_a, friend_b]), np.concatenate([friend_b, friend_a]), n_users)
+        self.events = SparseRows(attendee_index, event_index, n_users)
+        self.attendees = SparseRows(event_index, attendee_index, n_events)
+
+    def index_of(self, user_ids):
+        ids = np.fromiter(user_ids, dtype=np.int64)
+        positions = np.searchsorted(self.user_ids, ids)
+        found = positions < len(self.user_ids)
+        found[found] = self.user_ids[positions[found]] == ids[found]
+        return positions[found]
+
+    def top_candidates(self, block, limit):
+        """
+        Yield (user_id, candidate_id, score, mutual_friends, shared_events)
+        for the best `limit` candidates of every user in `block` (dense indexes).
+        """
+        n = len(self.user_ids)
+        friends, friend_owner = self.friends.gather(block)
+        friends_of_friends, via_friend = self.friends.gather(friends)
+        events, event_owner = self.events.gather(block)
+        co_attendees, via_event = self.attendees.gather(events)
+
+        mutual_keys = block[friend_owner[via_friend]] * n + friends_of_friends
+        shared_keys = block[event_owner[via_event]] * n + co_attendees
+        keys, inverse = np.unique(np.concatenate([mutual_keys, shared_keys]), return_inverse=True)
+        mutual = np.bincount(inverse[:len(mutual_keys)], minlength=len(keys))
+        shared = np.bincount(inverse[len(mutual_keys):], minlength=len(keys))
+
+        # Never suggest yourself or someone who is already a friend.
+        excluded = np.concatenate([block * n + block, block[friend_owner] * n + friends])
+        keep = ~np.isin(keys, excluded)
+        keys, mutual, shared = keys[keep], mutual[keep], shared[keep]
+        scores = MUTUAL_FRIEND_WEIGHT * mutual + SHARED_EVENT_WEIGHT * shared
+        owners, candidates = np.divmod(keys, n)
+
+        for i in top_per_owner(owners, scores, limit):
+            yield (
+                int(self.user_ids[owners[i]]), int(self.user_ids[candidates[i]]),
+                float(scores[i]), int(mutual[i]), int(shared[i]),
+            )
+
+
+def refresh(user_ids=None, limit=None):
+    """
+    Recompute recommendations for `user_ids` (everyone when None) and
+    return how many users were refreshed.
+    """
+    limit = limit or settings.FRIEND_RECOMMENDATIONS_PER_USER
+    if user_ids is not None:
+        user_ids = set(user_ids)
+    graph = Graph(user_ids)
+    if user_ids is None:
+        targets = np.arange(len(graph.user_ids))
+        gone = []
+    else:
+        targets = graph.index_of(user_ids)
+        # Users no longer in the graph at all just lose their old rows.
+        gone = list(user_ids - set(graph.user_ids[targets].tolist()))
+
+    started = timezone.now()
+    refreshed = 0
+    for start in range(0, len(targets), BLOCK_SIZE):
+        block = targets[start:start + BLOCK_SIZE]
+        rows = [
+            FriendRecommendation(user_id=user_id, candidate_id=candidate_id, score=score,
+                                 mutual_friends=mutual, shared_events=shared)
+            for user_id, candidate_id, score, mutual, shared in graph.top_candidates(block, limit)
+        ]
+        with transaction.atomic():
+            FriendRecommendation.objects.filter(user_id__in=graph.user_ids[block].tolist()).delete()
+            FriendRecommendation.objects.bulk_create(rows, batch_size=1000)
+        refreshed += len(block)
+
+    if user_ids is None:
+        # Everyone still in the graph was just rewritten; what is left is stale.
+        FriendRecommendation.objects.filter(computed_at__lt=started).delete()
+    elif gone:
+        FriendRecommendation.objects.filter(user_id__in=gone).delete()
+    return refreshed + len(gone)
+
+
+def mark_stale(*user_ids):
+    RecommendationRefresh.objects.bulk_create(
+        [RecommendationRefresh(user_id=user_id, requested_at=timezone.now()) for user_id in set(user_ids) if user_id],
+        update_conflicts=True, unique_fields=['user'], update_fields=['requested_at'],
+    )
+
+
+def refresh_stale():
+    """
+    Incremental refresh: users marked stale plus their friends, whose
+    mutual-friend counts move whenever a stale user's friendships do.
+    """
+    started = timezone.now()
+    stale = set(RecommendationRefresh.objects.filter(requested_at__lte=started).values_list('user_id', flat=True))
+    if not stale:
+        return 0
+    affected = set(stale)
+    friendships = Friendship.objects.filter(Q(user1_id__in=stale) | Q(user2_id__in=stale))
+    for user1_id, user2_id in friendships.values_list('user1_id', 'user2_id'):
+        affected.update((user1_id, user2_id))
+    refreshed = refresh(affected)
+    # Marks made while we were computing stay queued for the next run.
+    RecommendationRefresh.objects.filter(user_id__in=stale, requested_at__lte=started).delete()
+    return refreshed
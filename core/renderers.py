@@ -0,0 +1,100 @@
+import itertools
+
+import orjson
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson would format datetimes its own way; hand them (and Decimal, UUID,
+# lazy strings...) to DRF's encoder so they come out as JSONRenderer writes
+# them. The output decodes to the same values as JSONRenderer's, but isn't
+# always the same bytes: orjson writes floats in its own shortest form
+# (1e16, not 1e+16) and NaN / Infinity as null instead of raising.
+_encoder = JSONEncoder()
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    try:
+        ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # orjson refuses integers wider than 64 bits; the stdlib encoder doesn't.
+        # Anything else it refuses, JSONRenderer raises for as well.
+        return JSONRenderer().render(data)
+    # Same JavaScript-safety escaping as JSONRenderer (U+2028 / U+2029).
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for JSONRenderer backed by orjson. Indented output
+    (the browsable API, ?indent=) is left to JSONRenderer.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if renderer_context.get('indent') or (accepted_media_type and 'indent=' in accepted_media_type):
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def stream_json_list(rows, serialize_chunk, chunk_size=500):
+    """
+    Stream a JSON array without building it in memory: `rows` is consumed in
+    chunks (pass a queryset `.iterator()`), each chunk is turned into a list
+    by `serialize_chunk` and encoded on its own.
+
+    The first chunk is read and encoded before this returns, so the query
+    runs inside the view: under the middleware's replica routing and query
+    log, and a failure is an ordinary 500. Later chunks are produced after
+    the middleware has returned and only fetch more rows from that query's
+    cursor, so `serialize_chunk` must not query on its own.
+    """
+    rows = iter(rows)
+    head = dumps(serialize_chunk(list(itertools.islice(rows, chunk_size))))[1:-1]
+
+    def generate():
+        yield b'[' + head
+        first = not head
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                body = dumps(serialize_chunk(chunk))[1:-1]
+                yield body if first else b',' + body
+                first = False
+                chunk = []
+        if chunk:
+            body = dumps(serialize_chunk(chunk))[1:-1]
+            yield body if first else b',' + body
+        yield b']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def passthrough_response(upstream):
+    """Forward an upstream `requests` response body byte-for-byte."""
+    return HttpResponse(
+        upstream.content,
+        status=upstream.status_code,
+        content_type=upstream.headers.get('Content-Type', 'application/json'),
+    )
@@ -0,0 +1,47 @@
+"""
+Read-only fast path for list endpoints: dicts straight from values_list().
+
+A RowMapper is declared once per payload shape, mapping output keys to ORM
+lookups, and compiles that into a function that turns a values_list()
+tuple into the response dict. Model instances are never built and no DRF
+field runs per row. Columns whose DRF field would change the value (dates,
+decimals) get a converter, which keeps the output identical to the
+serializer it replaces; plain text columns are copied as they are.
+"""
+
+
+class RowMapper:
+    def __init__(self, fields, converters=None):
+        self.keys = tuple(fields)
+        self.columns = tuple(fields.values())
+        converters = converters or {}
+        steps = [(i, converters[key]) for i, key in enumerate(self.keys) if key in converters]
+        keys = self.keys
+
+        if not steps:
+            def build(row):
+                return dict(zip(keys, row))
+        else:
+            def build(row):
+                row = list(row)
+                for i, convert in steps:
+                    if row[i] is not None:
+                        row[i] = convert(row[i])
+                return dict(zip(keys, row))
+        self.build = build
+
+    def values(self, queryset):
+        """`queryset` as the tuples this mapper reads."""
+        return queryset.values_list(*self.columns)
+
+    def __call__(self, rows):
+        return list(map(self.build, rows))
+
+
+# FriendEventSerializer's shape: an attended event as the friends feed shows it.
+FRIEND_EVENT = RowMapper({
+    'id': 'event_id',
+    'name': 'title',
+    'date': 'date',
+    'image_url': 'image_url',
+})
@@ -1,22 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import FriendRequest, Friendship, WishListEvent, AttendedEvent, Message, Notification, Event, Invitation
+from .models import FriendRequest, Friendship, WishListEvent, AttendedEvent, Message, Notification, Event, Invitation, Conversation
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .fieldsets import SparseFieldsetMixin
 
 User = get_user_model()
 
 # -----------------------------
 # User & Registration
 # -----------------------------
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    avatar = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'profile_pic', 'bio']
+        fields = ['id', 'username', 'email', 'profile_pic', 'bio', 'avatar']
+        sparse_sources = {'avatar': ['profile_pic']}
 
-    def to_representation(self, instance):
-        rep = super().to_representation(instance)
-        rep['avatar'] = instance.profile_pic.url if instance.profile_pic and hasattr(instance.profile_pic, 'url') else None
-        return rep
+    def get_avatar(self, instance):
+        return instance.profile_pic.url if instance.profile_pic and hasattr(instance.profile_pic, 'url') else None
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -67,12 +69,23 @@ class FriendshipSerializer(serializers.ModelSerializer):
 class WishlistEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = WishListEvent
-        fields = ['id', 'event_id', 'title', 'date', 'image_url', 'added_at']
+        fields = ['id', 'event_id', 'title', 'date', 'image_url', 'city', 'added_at']
 
-class AttendedEventSerializer(serializers.ModelSerializer):
+class AttendedEventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = AttendedEvent
-        fields = ['id', 'event_id', 'title', 'date', 'image_url', 'attended_at']
+        fields = ['id', 'event_id', 'title', 'date', 'image_url', 'city', 'attended_at']
+        read_only_fields = ['attended_at']
+
+class CheckInSerializer(serializers.Serializer):
+    # One gate scan. `scanned_at` is the scanner's clock, for scans queued offline.
+    user = serializers.IntegerField(min_value=1)
+    event_id = serializers.CharField(max_length=100)
+    title = serializers.CharField(max_length=255)
+    date = serializers.CharField(max_length=100)
+    image_url = serializers.URLField()
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    scanned_at = serializers.DateTimeField(required=False)
 
 # -----------------------------
 # Messages & Notifications
@@ -82,7 +95,27 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ['id', 'sender', 'receiver', 'content', 'timestamp', 'is_read']
 
-class NotificationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(serializers.ModelSerializer):
+    friend = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+    friend_read_up_to = serializers.SerializerMethodField()
+    last_sender = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'friend', 'last_sender', 'last_message_preview', 'last_message_at', 'unread_count', 'friend_read_up_to']
+
+    def get_friend(self, obj):
+        return UserSerializer(obj.other(self.context['request'].user)).data
+
+    def get_unread_count(self, obj):
+        return obj.unread_for(self.context['request'].user)
+
+    def get_friend_read_up_to(self, obj):
+        user = self.context['request'].user
+        return obj.read_up_to_by(obj.other(user))
+
+class NotificationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sender_id = serializers.IntegerField(source='sender.id', read_only=True)
     sender_name = serializers.CharField(source='sender.username', read_only=True)
     recipient_id = serializers.IntegerField(source='recipient.id', read_only=True)
@@ -103,6 +136,8 @@ class EventSerializer(serializers.ModelSerializer):
             'description',
             'date',
             'location',
+            'latitude',
+            'longitude',
             'image',
             'is_public',
             'ticket_price',
@@ -111,6 +146,12 @@ class EventSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_by', 'created_at']
 
+class EventSearchSerializer(EventSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(EventSerializer.Meta):
+        fields = EventSerializer.Meta.fields + ['distance_km']
+
 class FriendEventSerializer(serializers.Serializer):
     id = serializers.CharField()
     name = serializers.CharField()
@@ -135,7 +176,7 @@ class FriendProfileSerializer(serializers.ModelSerializer):
 # -----------------------------
 # Invitation (for QR Code)
 # -----------------------------
-class InvitationSerializer(serializers.ModelSerializer):
+class InvitationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
     receiver_name = serializers.CharField(source='receiver.username', read_only=True)
 
@@ -0,0 +1,118 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import recommendations, sync, trending
+from .conditional import bump
+from .models import AttendedEvent, Conversation, FriendRequest, Friendship, Invitation, Message, Notification, User, WishListEvent
+
+
+@receiver(post_save, sender=Message)
+def update_conversation(sender, instance, created, **kwargs):
+    if created:
+        Conversation.record_message(instance)
+
+# ------------------- Conditional GET version stamps ----------------------
+
+@receiver(post_save, sender=User)
+def bump_user_versions(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump('profile', instance.id)
+    # Friend lists embed the user's name and avatar.
+    friend_ids = [
+        f.user2_id if f.user1_id == instance.id else f.user1_id
+        for f in Friendship.objects.filter(Q(user1=instance) | Q(user2=instance)).only('user1', 'user2')
+    ]
+    bump('friends', *friend_ids)
+
+
+@receiver([post_save, post_delete], sender=Friendship)
+def bump_friendship_versions(sender, instance, **kwargs):
+    bump('friends', instance.user1_id, instance.user2_id)
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def bump_notification_versions(sender, instance, **kwargs):
+    bump('notifications', instance.recipient_id)
+
+
+@receiver([post_save, post_delete], sender=Invitation)
+def bump_invitation_versions(sender, instance, **kwargs):
+    bump('invitations', instance.sender_id, instance.receiver_id)
+
+
+@receiver([post_save, post_delete], sender=AttendedEvent)
+def bump_attended_event_versions(sender, instance, **kwargs):
+    bump('attended_events', instance.user_id)
+
+# ------------------- Trending events ----------------------
+
+@receiver(post_save, sender=AttendedEvent)
+def count_attendance(sender, instance, created, **kwargs):
+    if created:
+        trending.record(instance, trending.ATTEND_WEIGHT, instance.attended_at, attended=1)
+
+
+@receiver(post_save, sender=WishListEvent)
+def count_wishlist(sender, instance, created, **kwargs):
+    if created:
+        trending.record(instance, trending.WISHLIST_WEIGHT, timezone.now(), wishlisted=1)
+
+# ------------------- Friend recommendations ----------------------
+
+@receiver([post_save, post_delete], sender=Friendship)
+def queue_friend_recommendations(sender, instance, **kwargs):
+    recommendations.mark_stale(instance.user1_id, instance.user2_id)
+
+
+@receiver([post_save, post_delete], sender=AttendedEvent)
+def queue_attendee_recommendations(sender, instance, created=True, **kwargs):
+    if created:
+        recommendations.mark_stale(instance.user_id)
+
+# ------------------- Delta sync change log ----------------------
+
+def _op(signal):
+    return sync.DELETE if signal is post_delete else sync.UPSERT
+
+
+@receiver(post_save, sender=User)
+def log_profile_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    friendships = Friendship.objects.filter(Q(user1=instance) | Q(user2=instance)).values_list('user1_id', 'user2_id')
+    sync.log('friends', sync.UPSERT, [
+        (user2_id if user1_id == instance.id else user1_id, instance.id) for user1_id, user2_id in friendships
+    ])
+
+
+@receiver([post_save, post_delete], sender=Friendship)
+def log_friendship_change(sender, instance, signal, **kwargs):
+    sync.log('friends', _op(signal), [(instance.user1_id, instance.user2_id), (instance.user2_id, instance.user1_id)])
+
+
+@receiver([post_save, post_delete], sender=FriendRequest)
+def log_friend_request_change(sender, instance, signal, **kwargs):
+    sync.log('friend_requests', _op(signal), [(instance.sender_id, instance.id), (instance.receiver_id, instance.id)])
+
+
+@receiver([post_save, post_delete], sender=Invitation)
+def log_invitation_change(sender, instance, signal, **kwargs):
+    sync.log('invitations', _op(signal), [(instance.sender_id, instance.id), (instance.receiver_id, instance.id)])
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def log_notification_change(sender, instance, signal, **kwargs):
+    sync.log('notifications', _op(signal), [(instance.recipient_id, instance.id)])
+
+
+@receiver([post_save, post_delete], sender=Message)
+def log_message_change(sender, instance, signal, **kwargs):
+    sync.log('messages', _op(signal), [(instance.sender_id, instance.id), (instance.receiver_id, instance.id)])
+
+
+@receiver([post_save, post_delete], sender=AttendedEvent)
+def log_attended_event_change(sender, instance, signal, **kwargs):
+    sync.log('attended_events', _op(signal), [(instance.user_id, instance.event_id)])
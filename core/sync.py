@@ -0,0 +1,150 @@
+"""
+Delta sync for mobile clients.
+
+Signals (and the bulk write paths, which send none) append ChangeLogEntry
+rows naming what changed for whom. GET sync/?since=<token> collapses the
+entries after the client's version to the latest op per object and reads
+the current payloads with one query per resource. Clients without a token,
+or whose token is older than the log's retention (or which are too far
+behind to be worth replaying), get a full snapshot instead.
+
+Ids are assigned at insert but become visible at commit, so the version
+handed back only advances past entries older than SYNC_SETTLE_SECONDS;
+newer ones are sent again next time, which is harmless as every change is
+an idempotent upsert or delete.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AttendedEvent, ChangeLogEntry, FriendRequest, Invitation, Message, Notification, User
+from .serializers import (
+    AttendedEventSerializer,
+    FriendRequestSerializer,
+    InvitationSerializer,
+    MessageSerializer,
+    NotificationSerializer,
+    UserSerializer,
+)
+
+SALT = 'core.sync'
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+class Resource:
+    def __init__(self, scope, key, serializer, snapshot=None):
+        self.scope = scope
+        self.key = key
+        self.serializer = serializer
+        # Extra filter for full snapshots; None leaves the resource out of them.
+        self.snapshot = snapshot
+
+    def payloads(self, queryset):
+        objects = list(queryset)
+        data = self.serializer(objects, many=True).data
+        return {str(getattr(obj, self.key)): item for obj, item in zip(objects, data)}
+
+
+RESOURCES = {
+    'friends': Resource(
+        lambda user: User.objects.filter(Q(friend1__user2=user) | Q(friend2__user1=user)).distinct(),
+        'id', UserSerializer, snapshot={},
+    ),
+    'friend_requests': Resource(
+        lambda user: FriendRequest.objects.filter(Q(sender=user) | Q(receiver=user)).select_related('sender'),
+        'id', FriendRequestSerializer, snapshot={'status': 'pending'},
+    ),
+    'invitations': Resource(
+        lambda user: Invitation.objects.filter(Q(sender=user) | Q(receiver=user)).select_related('sender', 'receiver'),
+        'id', InvitationSerializer, snapshot={'status': 'pending'},
+    ),
+    'notifications': Resource(
+        lambda user: Notification.objects.filter(recipient=user).select_related('sender', 'recipient'),
+        'id', NotificationSerializer, snapshot={},
+    ),
+    # Message history is too large to snapshot; clients reload it per conversation.
+    'messages': Resource(
+        lambda user: Message.objects.filter(Q(sender=user) | Q(receiver=user)),
+        'id', MessageSerializer,
+    ),
+    'attended_events': Resource(
+        lambda user: AttendedEvent.objects.filter(user=user),
+        'event_id', AttendedEventSerializer, snapshot={},
+    ),
+}
+
+
+def log(resource, op, entries):
+    """Append one entry per (user_id, object_id) pair."""
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(user_id=user_id, resource=resource, op=op, object_id=str(object_id))
+        for user_id, object_id in entries if user_id
+    ])
+
+
+def make_token(user, version):
+    return signing.TimestampSigner(salt=SALT).sign(f'{user.id}:{version}')
+
+
+def read_token(user, token):
+    """The version in `token`, or None when it is unusable and a snapshot is needed."""
+    # Stop trusting tokens a little before the entries after them could have been pruned.
+    max_age = timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS) - timedelta(hours=1)
+    try:
+        user_id, version = signing.TimestampSigner(salt=SALT).unsign(token, max_age=max_age).split(':')
+        if int(user_id) == user.id:
+            return int(version)
+    except (signing.BadSignature, ValueError):
+        pass
+    return None
+
+
+def _settled_before():
+    return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def changes_since(user, version):
+    """(new version, changes), or None when replaying would cost more than a snapshot."""
+    entries = list(
+        ChangeLogEntry.objects.filter(user=user, id__gt=version)
+        .order_by('id')
+        .values_list('id', 'resource', 'op', 'object_id', 'created_at')[:settings.SYNC_MAX_CHANGES + 1]
+    )
+    if len(entries) > settings.SYNC_MAX_CHANGES:
+        return None
+
+    settled = _settled_before()
+    new_version, unsettled = version, False
+    latest = {}
+    for entry_id, resource, op, object_id, created_at in entries:
+        # The version stops at the first entry that may still have uncommitted neighbours.
+        unsettled = unsettled or created_at > settled
+        if not unsettled:
+            new_version = entry_id
+        latest[(resource, object_id)] = op
+
+    changes = {}
+    for name, resource in RESOURCES.items():
+        upserted = {object_id for (kind, object_id), op in latest.items() if kind == name and op == UPSERT}
+        deleted = {object_id for (kind, object_id), op in latest.items() if kind == name and op == DELETE}
+        if not upserted and not deleted:
+            continue
+        payloads = resource.payloads(resource.scope(user).filter(**{f'{resource.key}__in': upserted})) if upserted else {}
+        # Gone (or no longer visible) by the time we looked: the client should drop it too.
+        deleted |= upserted - set(payloads)
+        changes[name] = {'upserted': list(payloads.values()), 'deleted': sorted(deleted)}
+    return new_version, changes
+
+
+def snapshot(user):
+    latest = ChangeLogEntry.objects.filter(user=user, created_at__lte=_settled_before()).order_by('-id').first()
+    version = latest.id if latest else 0
+    changes = {
+        name: {'upserted': list(resource.payloads(resource.scope(user).filter(**resource.snapshot)).values()), 'deleted': []}
+        for name, resource in RESOURCES.items() if resource.snapshot is not None
+    }
+    return version, changes
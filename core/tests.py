@@ -1,3 +1,256 @@
-from django.test import TestCase
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from . import batch, db_router, google_auth
+from .middleware import ReplicaRoutingMiddleware
+from .models import FriendRequest, User
+from .throttling import SlidingWindowRateThrottle
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # Not TestCase: reads inside a transaction always go to the primary.
+    databases = {'default', 'replica0'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        db_router._lag.clear()
+        cache.clear()
+
+    def route(self, use_replicas=True, wrote=False):
+        use_token = db_router._use_replicas.set(use_replicas)
+        wrote_token = db_router._wrote.set(wrote)
+        try:
+            return User.objects.all().db
+        finally:
+            db_router._use_replicas.reset(use_token)
+            db_router._wrote.reset(wrote_token)
+
+    def test_reads_stay_on_primary_outside_requests(self):
+        self.assertEqual(self.route(use_replicas=False), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertEqual(self.route(), 'replica0')
+        # The local replica mirrors the primary's test database.
+        self.assertTrue(User.objects.using('replica0').filter(id=self.user.id).exists())
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        self.assertEqual(self.route(wrote=True), 'default')
+
+    def test_write_pins_the_client_to_primary(self):
+        routed = []
+
+        def view(request):
+            if request.method == 'POST':
+                User.objects.filter(id=self.user.id).update(bio='wrote')
+            routed.append(User.objects.all().db)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory(HTTP_AUTHORIZATION='Bearer pinned')
+        middleware(factory.get('/'))
+        middleware(factory.post('/'))
+        middleware(factory.get('/'))
+        middleware(RequestFactory(HTTP_AUTHORIZATION='Bearer other').get('/'))
+        self.assertEqual(routed, ['replica0', 'default', 'default', 'replica0'])
+
+
+class FixedKeyThrottle(SlidingWindowRateThrottle):
+    rate = '4/min'
+
+    def get_cache_key(self, request, view):
+        return 'throttle-test'
+
+
+@override_settings(
+    THROTTLE_CACHE_ALIAS='throttle',
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        # In-memory stand-in for the shared Redis cache.
+        'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-tests'},
+    },
+)
+class SlidingWindowThrottleTests(SimpleTestCase):
+    # Window 100 of 60 seconds starts here.
+    WINDOW_START = 6000.0
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def tearDown(self):
+        FixedKeyThrottle().cache.clear()
+
+    def attempts(self, at, count, throttle=None):
+        """How many of `count` requests at time `at` are allowed."""
+        allowed = 0
+        for _ in range(count):
+            instance = throttle or FixedKeyThrottle()
+            instance.timer = lambda: at
+            allowed += instance.allow_request(self.request, None)
+        return allowed
+
+    def test_limit_applies_within_a_window(self):
+        self.assertEqual(self.attempts(self.WINDOW_START + 30, 6), 4)
+
+    def test_counters_are_shared_between_instances(self):
+        # Each request gets a fresh throttle, as on different workers.
+        self.assertEqual(self.attempts(self.WINDOW_START + 10, 2), 2)
+        self.assertEqual(self.attempts(self.WINDOW_START + 20, 5), 2)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        self.assertEqual(self.attempts(self.WINDOW_START + 59, 4), 4)
+        # Right after the boundary the previous window still counts in full.
+        self.assertEqual(self.attempts(self.WINDOW_START + 60, 1), 0)
+        # Halfway through, it counts for 4 * 0.5 = 2 of the 4 slots.
+        self.assertEqual(self.attempts(self.WINDOW_START + 90, 4), 2)
+        # Two windows on, it no longer counts at all.
+        self.assertEqual(self.attempts(self.WINDOW_START + 180, 5), 4)
+
+    def test_wait_is_the_rest_of_the_window_without_history(self):
+        throttle = FixedKeyThrottle()
+        self.attempts(self.WINDOW_START + 15, 4, throttle)
+        self.assertFalse(self.attempts(self.WINDOW_START + 15, 1, throttle))
+        self.assertAlmostEqual(throttle.wait(), 45)
+
+
+def signing_key(kid):
+    """An RSA private key and its public JWK, as Google publishes them."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=kid, alg='RS256', use='sig')
+    return private_key, jwk
+
+
+class GoogleTokenVerifierTests(SimpleTestCase):
+    AUDIENCE = 'client-id.apps.googleusercontent.com'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.old_key, cls.old_jwk = signing_key('old')
+        cls.new_key, cls.new_jwk = signing_key('new')
+
+    def setUp(self):
+        cache.clear()
+        self.verifier = google_auth.GoogleTokenVerifier(certs_url='https://certs.invalid/')
+        self.fetch = mock.patch.object(self.verifier.session, 'get', side_effect=AssertionError('fetched JWKS')).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def token(self, key, kid, **claims):
+        now = int(time.time())
+        claims = {'iss': 'https://accounts.google.com', 'aud': self.AUDIENCE, 'sub': '42',
+                  'iat': now, 'exp': now + 600, **claims}
+        return jwt.encode(claims, key, algorithm='RS256', headers={'kid': kid})
+
+    def serve(self, *jwks, max_age=600):
+        response = mock.Mock(headers={'Cache-Control': f'public, max-age={max_age}'})
+        response.json.return_value = {'keys': list(jwks)}
+        self.fetch.side_effect = None
+        self.fetch.return_value = response
+
+    def test_verifies_against_installed_keys_without_fetching(self):
+        self.verifier.install_keys({'keys': [self.old_jwk]})
+        claims = self.verifier.verify(self.token(self.old_key, 'old'), self.AUDIENCE)
+        self.assertEqual(claims['sub'], '42')
+        self.fetch.assert_not_called()
+
+    def test_rejects_wrong_audience_and_forged_signature(self):
+        self.verifier.install_keys({'keys': [self.old_jwk]})
+        with self.assertRaises(ValueError):
+            self.verifier.verify(self.token(self.old_key, 'old', aud='someone-else'), self.AUDIENCE)
+        with self.assertRaises(ValueError):
+            # Signed with a key that isn't the one published under this kid.
+            self.verifier.verify(self.token(self.new_key, 'old'), self.AUDIENCE)
+
+    def test_fetches_keys_and_honours_max_age(self):
+        self.serve(self.old_jwk, max_age=1234)
+        self.verifier.verify(self.token(self.old_key, 'old'), self.AUDIENCE)
+        entry = cache.get(google_auth.JWKS_CACHE_KEY)
+        self.assertEqual(entry['expires_at'] - entry['fetched_at'], 1234)
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_unknown_kid_refetches_once_per_cooldown(self):
+        self.verifier.install_keys({'keys': [self.old_jwk]})
+        self.serve(self.old_jwk, self.new_jwk)
+        # Google rotated keys before our copy expired.
+        self.verifier.verify(self.token(self.new_key, 'new'), self.AUDIENCE)
+        self.assertEqual(self.fetch.call_count, 1)
+
+        with self.assertRaises(ValueError):
+            self.verifier.verify(self.token(self.new_key, 'unknown'), self.AUDIENCE)
+        # Within UNKNOWN_KID_COOLDOWN of the last forced refresh: no second fetch.
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_refreshes_ahead_of_expiry_in_the_background(self):
+        entry = self.verifier.install_keys({'keys': [self.old_jwk]}, max_age=100)
+        # 90% of the max-age has passed, beyond REFRESH_AHEAD.
+        cache.set(google_auth.JWKS_CACHE_KEY, {**entry, 'fetched_at': entry['fetched_at'] - 90,
+                                               'expires_at': entry['expires_at'] - 90})
+        self.serve(self.old_jwk, self.new_jwk)
+        with mock.patch.object(google_auth.threading, 'Thread') as thread:
+            thread.side_effect = lambda target, daemon: mock.Mock(start=target)
+            self.verifier.verify(self.token(self.old_key, 'old'), self.AUDIENCE)
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertIn('new', cache.get(google_auth.JWKS_CACHE_KEY)['keys'])
+        self.assertIsNone(cache.get(google_auth.REFRESH_LOCK_KEY))
+
+
+class BatchTests(TransactionTestCase):
+    # Not TestCase: concurrent GETs run on worker threads with their own connections.
+    databases = {'default', 'replica0'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='receiver', email='receiver@example.com', password='pw')
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='pw')
+        FriendRequest.objects.create(sender=self.sender, receiver=self.user, status='pending')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, *specs):
+        response = self.client.post('/api/batch/', {'requests': list(specs)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['responses']
+
+    def test_reads_after_a_write_see_it(self):
+        friends = {'method': 'GET', 'path': '/api/friends/?fields=id'}
+        before, accepted, after = self.post(
+            friends,
+            {'method': 'POST', 'path': '/api/friend-requests/accept/', 'body': {'sender_id': self.sender.id}},
+            friends,
+        )
+        self.assertEqual(before['body'], [])
+        self.assertEqual(accepted['status'], 200)
+        # friend_ids is shared across the batch; the write must have cleared it.
+        self.assertEqual(after['body'], [{'id': self.sender.id}])
+
+    def test_responses_keep_request_order(self):
+        responses = self.post(
+            {'id': 'a', 'path': '/api/friends/'},
+            {'id': 'b', 'path': '/api/notifications/'},
+            {'id': 'c', 'path': '/api/no-such-endpoint/'},
+            {'id': 'd', 'path': '/api/friends/'},
+        )
+        self.assertEqual([r['id'] for r in responses], ['a', 'b', 'c', 'd'])
+        self.assertEqual([r['status'] for r in responses], [200, 200, 404, 200])
+
+    def test_nested_batches_are_rejected(self):
+        response = self.client.post('/api/batch/', {'requests': [{'method': 'POST', 'path': '/api/batch/'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_utf8_text_bodies_are_base64(self):
+        encoded = json.loads(batch.encode([
+            {'id': 0, 'status': 200, 'headers': {}, 'content_type': 'text/plain', 'body': 'caf\u00e9'.encode()},
+            {'id': 1, 'status': 200, 'headers': {}, 'content_type': 'text/plain', 'body': b'\xff\xfe'},
+        ]))['responses']
+        self.assertEqual(encoded[0]['body'], 'caf\u00e9')
+        self.assertNotIn('encoding', encoded[0])
+        self.assertEqual((encoded[1]['encoding'], encoded[1]['body']), ('base64', '//4='))
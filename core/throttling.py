@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window counter throttle.
+
+    Instead of a list of request timestamps, each client keeps one integer per
+    fixed window in the shared throttle cache. The request rate is estimated
+    from the current window plus the previous window weighted by how much of
+    it still overlaps the sliding window, so a check is one get_many and one
+    atomic incr no matter how high the rate is.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = (self.now % self.duration) / self.duration
+        current_key = f'{self.key}:{window}'
+        previous_key = f'{self.key}:{window - 1}'
+
+        counts = self.cache.get_many([previous_key, current_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+        weighted = self.previous * (1 - self.elapsed)
+        if weighted + self.current >= self.num_requests:
+            return self.throttle_failure()
+
+        # Counters outlive their own window so the next one can still weigh them.
+        self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr(); start the window again.
+            self.cache.set(current_key, 1, self.duration * 2)
+            self.current = 1
+
+        if weighted + self.current > self.num_requests:
+            # Lost the race for the last slot to a concurrent request.
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed)
+        free = self.num_requests - self.current
+        if not self.previous or free <= 0:
+            return remaining
+        # The previous window's weight decays linearly; wait until it leaves a free slot.
+        needed = 1 - free / self.previous
+        return max(0.0, min(remaining, (needed - self.elapsed) * self.duration))
+
+
+class AnonSlidingWindowThrottle(AnonRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(UserRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class ScopedSlidingWindowThrottle(ScopedRateThrottle, SlidingWindowRateThrottle):
+    """
+    Per-scope limits for views that set `throttle_scope`, e.g. the
+    Ticketmaster proxies ('proxy'), user search ('search') and the payment
+    initiation endpoints ('payments').
+    """
@@ -0,0 +1,156 @@
+import bisect
+import contextlib
+import functools
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import EventTrend
+
+# Forward decay: an engagement at time t is worth weight * exp(LAMBDA * (t - EPOCH)).
+# Scores are stored as logarithms so they never overflow however far t moves
+# from EPOCH, and comparing stored scores compares current popularity.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+LAMBDA = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+ATTEND_WEIGHT = 2.0
+WISHLIST_WEIGHT = 1.0
+
+LEADERBOARD_SIZE = 100
+GLOBAL = ''
+
+# Read-modify-write of a cached board is serialized through a cache.add lock;
+# a writer that can't get it in time drops the board so the next read rebuilds it.
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 0.5
+
+
+def log_weight(weight, when):
+    return math.log(weight) + LAMBDA * (when - EPOCH).total_seconds()
+
+
+def log_add(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def current_score(log_score, now):
+    """Decayed score as of `now`, in engagement units."""
+    return math.exp(log_score - LAMBDA * (now - EPOCH).total_seconds())
+
+
+def normalize_city(city):
+    # EventTrend.city's max_length: anything longer can't match a row.
+    return (city or '').strip().lower()[:100]
+
+
+def _leaderboard_key(city):
+    return f'trending:{city or "all"}'
+
+
+def record(event, weight, when, attended=0, wishlisted=0):
+    """
+    Fold one AttendedEvent / WishListEvent into the global and per-city
+    counters and their cached leaderboards. Runs inside the caller's request:
+    two locked EventTrend upserts per save, serialized per event.
+    """
+    _fold(event, log_weight(weight, when), attended, wishlisted)
+
+
+def record_attendances(attended_events):
+    """
+    `record` for AttendedEvent rows written with bulk_create (which sends no
+    post_save): one counter update per event and city instead of per row,
+    each row still weighted by its own `attended_at`.
+    """
+    grouped = {}
+    for event in attended_events:
+        grouped.setdefault((event.event_id, normalize_city(event.city)), []).append(event)
+    for rows in grouped.values():
+        increment = functools.reduce(log_add, (log_weight(ATTEND_WEIGHT, row.attended_at) for row in rows))
+        _fold(rows[-1], increment, len(rows), 0)
+
+
+def _fold(event, increment, attended, wishlisted):
+    cities = {GLOBAL, normalize_city(event.city)}
+    with transaction.atomic():
+        for city in cities:
+            trend, created = EventTrend.objects.select_for_update().get_or_create(
+                event_id=event.event_id, city=city,
+                defaults={'title': event.title, 'date': event.date, 'image_url': event.image_url,
+                          'log_score': increment},
+            )
+            if not created:
+                trend.log_score = log_add(trend.log_score, increment)
+                trend.title, trend.date, trend.image_url = event.title, event.date, event.image_url
+            trend.attended_count += attended
+            trend.wishlist_count += wishlisted
+            trend.save()
+            transaction.on_commit(lambda t=trend: _update_leaderboard(t))
+
+
+def _entry(trend):
+    return (-trend.log_score, trend.event_id, trend.title, trend.date, trend.image_url)
+
+
+@contextlib.contextmanager
+def _board_lock(key):
+    """Yields whether the lock on `key`'s board was acquired within LOCK_WAIT."""
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    while not (acquired := cache.add(lock_key, 1, LOCK_TIMEOUT)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def _update_leaderboard(trend):
+    key = _leaderboard_key(trend.city)
+    with _board_lock(key) as locked:
+        if not locked:
+            cache.delete(key)
+            return
+        board = cache.get(key)
+        if board is None:
+            return
+        board = [row for row in board if row[1] != trend.event_id]
+        bisect.insort(board, _entry(trend))
+        cache.set(key, board[:LEADERBOARD_SIZE], None)
+
+
+def rebuild_leaderboard(city):
+    key = _leaderboard_key(city)
+    # Read under the lock too, so an update can't land between the query and
+    # the cache.set and be overwritten. Without the lock, serve but don't publish.
+    # Empty city boards aren't kept: any ?city= string reaches here, and
+    # caching each one forever would let callers fill the cache.
+    with _board_lock(key) as locked:
+        board = [
+            _entry(trend)
+            for trend in EventTrend.objects.filter(city=city).order_by('-log_score')[:LEADERBOARD_SIZE]
+        ]
+        if locked and (board or city == GLOBAL):
+            cache.set(key, board, None)
+    return board
+
+
+def leaderboard(city, limit, now):
+    """Top events for a city ('' for everywhere), straight from the cached sorted list."""
+    city = normalize_city(city)
+    board = cache.get(_leaderboard_key(city))
+    if board is None:
+        board = rebuild_leaderboard(city)
+    return [{
+        'id': event_id,
+        'name': title,
+        'date': date,
+        'image_url': image_url,
+        'score': round(current_score(-neg_log_score, now), 3),
+    } for neg_log_score, event_id, title, date, image_url in board[:limit]]
@@ -9,6 +9,7 @@ from .views import (
     CheckEmailView,
     UserProfileView,
     FriendListAPIView,
+    FriendRecommendationsAPIView,
     FriendEventsAPIView,
     FriendProfileAPIView,
     SendFriendRequestView,
@@ -18,11 +19,26 @@ from .views import (
     InvitationListView,
     InvitationCreateView,
     InvitationUpdateView,
+    InvitationCodeView,
+    InvitationQRImageView,
+    InvitationScanView,
     AttendedEventCreateView,
+    CheckInBatchView,
+    SyncView,
+    BatchView,
     FriendDeleteAPIView,
     LoginView,MarkAllNotificationsReadView,
     AcceptFriendRequestView,
-    RejectFriendRequestView, FriendDeleteAPIView, TicketmasterProxyView, TicketmasterEventDetailProxyView
+    RejectFriendRequestView, BulkFriendRequestView, BulkInvitationView, FriendDeleteAPIView, TicketmasterProxyView, TicketmasterEventDetailProxyView,
+    UpstreamQuotaView,
+    DatabaseRoutingMetricsView,
+    ProfileListView,
+    ProfileFileView,
+    ConversationListAPIView,
+    ConversationReadAPIView,
+    EventSearchAPIView,
+    TrendingEventsAPIView,
+    RecommendedEventsAPIView,
 
 )
 
@@ -38,24 +54,31 @@ urlpatterns = [
 
     # Events
     path('discover/', DiscoverEventsAPIView.as_view(), name='discover-events'),
+    path('events/search/', EventSearchAPIView.as_view(), name='event-search'),
+    path('events/trending/', TrendingEventsAPIView.as_view(), name='event-trending'),
+    path('events/recommended/', RecommendedEventsAPIView.as_view(), name='event-recommended'),
 
     # Profile
     path('profile/', UserProfileView.as_view(), name='user-profile'),
 
     # Friends
     path('friends/', FriendListAPIView.as_view(), name='friend-list'),
+    path('friends/recommendations/', FriendRecommendationsAPIView.as_view(), name='friend-recommendations'),
     path('friend-events/', FriendEventsAPIView.as_view(), name='friend-events'),
     path('friends/<int:friend_id>/', FriendProfileAPIView.as_view(), name='friend-profile'),
     path('friend-requests/', SendFriendRequestView.as_view(), name='send-friend-request'),
     path('friend-requests/<int:receiver_id>/', SendFriendRequestView.as_view(), name='cancel_friend_request'),
     path('friend-requests/accept/', AcceptFriendRequestView.as_view(), name='accept-friend-request'),
     path('friend-requests/reject/', RejectFriendRequestView.as_view(), name='reject-friend-request'),
+    path('friend-requests/bulk/', BulkFriendRequestView.as_view(), name='bulk-friend-requests'),
     path('friends/delete/<int:friend_id>/', FriendDeleteAPIView.as_view(), name='friend-delete'),
 
     # User Search
     path('users/search/', UserSearchView.as_view(), name='user-search'),
 
     # Messages
+    path('conversations/', ConversationListAPIView.as_view(), name='conversations'),
+    path('conversations/<int:conversation_id>/read/', ConversationReadAPIView.as_view(), name='conversation-read'),
     path('messages/<int:friend_id>/', MessageListCreateAPIView.as_view(), name='messages'),
 
     # Notifications
@@ -66,11 +89,23 @@ urlpatterns = [
     path('invitations/', InvitationListView.as_view(), name='invitation-list'),
     path('invitations/create/', InvitationCreateView.as_view(), name='invitation-create'),
     path('invitations/<int:invitation_id>/', InvitationUpdateView.as_view(), name='invitation-detail'),
+    path('invitations/<int:invitation_id>/code/', InvitationCodeView.as_view(), name='invitation-code'),
+    path('invitations/bulk/', BulkInvitationView.as_view(), name='invitation-bulk'),
+    path('invitations/scan/', InvitationScanView.as_view(), name='invitation-scan'),
+    path('invitations/qr/<str:token>.png', InvitationQRImageView.as_view(), name='invitation-qr'),
 
     # Attended Events
     path('attended-events/', AttendedEventCreateView.as_view(), name='attended-events'),
+    path('check-ins/batch/', CheckInBatchView.as_view(), name='check-in-batch'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('batch/', BatchView.as_view(), name='batch'),
 
     #source events
     path('ticketmaster/', TicketmasterProxyView.as_view(), name='ticketmaster-proxy'),
     path('ticketmaster/<str:event_id>/', TicketmasterEventDetailProxyView.as_view(), name='ticketmaster-event-detail'),
+    path('upstream-quota/', UpstreamQuotaView.as_view(), name='upstream-quota'),
+    path('db-routing/', DatabaseRoutingMetricsView.as_view(), name='db-routing'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<slug:name>.svg', ProfileFileView.as_view(), {'kind': 'svg'}, name='profile-flamegraph'),
+    path('profiles/<slug:name>.folded', ProfileFileView.as_view(), {'kind': 'folded'}, name='profile-stacks'),
 ]
@@ -1,8 +1,10 @@
+import math
 import requests
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from decimal import Decimal, InvalidOperation
 from decouple import config
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -11,23 +13,35 @@ from django.core.mail import send_mail
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.urls import reverse
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.conf import settings
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from .serializers import (
     RegisterSerializer,
     UserSerializer,
-    FriendEventSerializer,
     FriendRequestSerializer,
     MessageSerializer,
     NotificationSerializer,
+    ConversationSerializer,
+    EventSearchSerializer,
     InvitationSerializer,
-    AttendedEventSerializer, CustomTokenObtainPairSerializer
+    AttendedEventSerializer, CheckInSerializer, CustomTokenObtainPairSerializer
 )
-from .models import User, Friendship, FriendRequest, AttendedEvent, Message, Notification, Invitation
+from .models import User, Friendship, FriendRequest, AttendedEvent, Message, Notification, Invitation, Conversation, MessageArchive, Event, FriendRecommendation, EventRecommendation
 from .utils import send_otp_email
+from . import batch, check_ins, db_router, fieldsets, friend_actions, geo, invitation_tokens, profiling, sync, trending
+from .google_auth import google_verifier
+from .conditional import bump, conditional_get
+from .renderers import passthrough_response, stream_json_list
+from .row_mappers import FRIEND_EVENT
+from .throttling import ScopedSlidingWindowThrottle
+from .quota import DETAIL, SEARCH, QuotaExceeded, get_governor, governed_get
 
 User = get_user_model()
 
@@ -82,10 +96,58 @@ class ResetPasswordView(APIView):
         user.save()
         return Response({"message": "Password has been reset successfully."})
 
+# ------------------- Upstream Quota & Ops Metrics ----------------------
+
+def upstream_busy(exc):
+    return Response(
+        {"error": "Event provider is busy, please try again shortly."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class UpstreamQuotaView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response([get_governor(provider).remaining() for provider in settings.UPSTREAM_QUOTAS])
+
+
+class DatabaseRoutingMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(db_router.snapshot())
+
+
+class ProfileListView(APIView):
+    """Request profiles in the ring, newest first, linking their flamegraphs."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        profiles = profiling.captured()
+        for profile in profiles:
+            profile['flamegraph'] = request.build_absolute_uri(reverse('profile-flamegraph', args=[profile['name']]))
+            profile['stacks'] = request.build_absolute_uri(reverse('profile-stacks', args=[profile['name']]))
+        return Response(profiles)
+
+
+class ProfileFileView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    CONTENT_TYPES = {'svg': 'image/svg+xml', 'folded': 'text/plain; charset=utf-8'}
+
+    def get(self, request, name, kind):
+        try:
+            content = (profiling.directory() / f'{name}.{kind}').read_bytes()
+        except FileNotFoundError:
+            return Response({"error": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(content, content_type=self.CONTENT_TYPES[kind])
+
 # ------------------- Event Discovery ----------------------
 
 class DiscoverEventsAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'proxy'
 
     def get(self, request):
         keyword = request.query_params.get("keyword", "music")
@@ -96,14 +158,169 @@ class DiscoverEventsAPIView(APIView):
         params = {"apikey": TICKETMASTER_API_KEY, "keyword": keyword, "city": location, "size": size}
 
         try:
-            res = requests.get(url, params=params)
+            res = governed_get('ticketmaster', url, priority=SEARCH, params=params)
             data = res.json()
             if "_embedded" in data and "events" in data["_embedded"]:
                 return Response(data["_embedded"]["events"])
             return Response({"detail": "No events found."}, status=404)
+        except QuotaExceeded as e:
+            return upstream_busy(e)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+class EventSearchAPIView(APIView):
+    """
+    Public user-created events near a point, soonest first.
+
+    Candidates come from the geohash cells covering the search circle plus a
+    bounding-box prefilter, both served by indexes; exact distance is then
+    checked in Python. Pages are keyed on (date, id) so each page is a single
+    index range scan no matter how deep the client has paged.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
+    max_radius_km = 500
+    max_page_size = 100
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            lat = self.parse_bounded(params['lat'], -90, 90)
+            lng = self.parse_bounded(params['lng'], -180, 180)
+            radius_km = min(self.parse_bounded(params.get('radius_km', 10), 0, math.inf), self.max_radius_km)
+            if radius_km <= 0:
+                raise ValueError(radius_km)
+            limit = max(1, min(int(params.get('limit', 20)), self.max_page_size))
+            min_price = self.parse_price(params.get('min_price'))
+            max_price = self.parse_price(params.get('max_price'))
+            cursor = self.decode_cursor(params.get('cursor'))
+        except (KeyError, ValueError, InvalidOperation):
+            return Response({
+                "error": "lat (-90 to 90) and lng (-180 to 180) are required; radius_km must be positive; "
+                         "limit and prices must be numbers.",
+            }, status=400)
+
+        try:
+            start = parse_datetime(params['from']) if params.get('from') else timezone.now()
+            if params.get('to'):
+                end = parse_datetime(params['to'])
+            else:
+                end = start and start + timedelta(days=30)
+        except ValueError:
+            # Well-formed but impossible, e.g. month 13.
+            start = end = None
+        if start is None or end is None:
+            return Response({"error": "from and to must be ISO 8601 datetimes."}, status=400)
+
+        min_lat, max_lat, min_lng, max_lng = geo.bounding_box(lat, lng, radius_km)
+        events = Event.objects.filter(
+            is_public=True, date__gte=start, date__lte=end,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+        )
+        if min_lng is not None:
+            events = events.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+        cells = Q()
+        for prefix in geo.covering_cells(lat, lng, radius_km):
+            low, high = geo.prefix_range(prefix)
+            cells |= Q(geohash__gte=low, geohash__lt=high) if high else Q(geohash__gte=low)
+        events = events.filter(cells)
+        if min_price is not None:
+            events = events.filter(ticket_price__gte=min_price)
+        if max_price is not None:
+            events = events.filter(ticket_price__lte=max_price)
+        events = events.order_by('date', 'id')
+
+        results, last, exhausted = [], cursor, False
+        batch_size = limit * 4
+        while len(results) < limit and not exhausted:
+            page = events
+            if last:
+                page = page.filter(Q(date__gt=last[0]) | Q(date=last[0], id__gt=last[1]))
+            batch = list(page[:batch_size])
+            exhausted = len(batch) < batch_size
+            for event in batch:
+                last = (event.date, event.id)
+                event.distance_km = round(geo.haversine_km(lat, lng, event.latitude, event.longitude), 3)
+                if event.distance_km <= radius_km:
+                    results.append(event)
+                    if len(results) == limit:
+                        exhausted = exhausted and event is batch[-1]
+                        break
+
+        return Response({
+            "next": None if exhausted else self.encode_cursor(last),
+            "results": EventSearchSerializer(results, many=True).data,
+        })
+
+    @staticmethod
+    def encode_cursor(position):
+        return urlsafe_base64_encode(force_bytes(f"{position[0].isoformat()}|{position[1]}"))
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        parsed = parse_datetime(date)
+        if parsed is None:
+            raise ValueError(cursor)
+        return parsed, int(pk)
+
+    @staticmethod
+    def parse_bounded(value, low, high):
+        number = float(value)
+        # float() accepts 'nan' and 'inf'; neither is a place or a distance.
+        if not math.isfinite(number) or not low <= number <= high:
+            raise ValueError(value)
+        return number
+
+    @staticmethod
+    def parse_price(value):
+        if value is None:
+            return None
+        price = Decimal(value)
+        if not price.is_finite():
+            raise ValueError(value)
+        return price
+
+class TrendingEventsAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), trending.LEADERBOARD_SIZE))
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=400)
+        city = request.query_params.get('city', '')
+        return Response(trending.leaderboard(city, limit, timezone.now()))
+
+class RecommendedEventsAPIView(APIView):
+    """
+    Personalized suggestions precomputed by `manage.py refresh_event_recommendations`;
+    users without any yet get the trending leaderboard.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), settings.EVENT_RECOMMENDATIONS_PER_USER))
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=400)
+        rows = EventRecommendation.objects.filter(user=request.user).order_by('-score')[:limit]
+        data = [{
+            "id": row.event_id,
+            "name": row.title,
+            "date": row.date,
+            "image_url": row.image_url,
+            "city": row.city,
+            "score": round(row.score, 3),
+            "reason": row.reason,
+            "friends": row.friend_count,
+        } for row in rows]
+        if not data:
+            data = [{**event, "reason": "trending"} for event in trending.leaderboard('', limit, timezone.now())]
+        return Response(data)
+
 # ------------------- Authentication and Registration ----------------------
 
 class GoogleAuthView(APIView):
@@ -115,7 +332,7 @@ class GoogleAuthView(APIView):
             return Response({'detail': 'Token is required'}, status=400)
         try:
             CLIENT_ID = config("GOOGLE_CLIENT_ID")
-            idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), CLIENT_ID)
+            idinfo = google_verifier.verify(token, CLIENT_ID)
             email = idinfo.get('email')
             name = idinfo.get('name')
             if not email:
@@ -172,8 +389,9 @@ class CheckEmailView(APIView):
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional_get('profile')
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(request.user, context={'request': request})
         return Response(serializer.data)
 
     def put(self, request):
@@ -187,6 +405,7 @@ class UserProfileView(APIView):
 
 class UserSearchView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
 
     def get(self, request):
         query = request.query_params.get('q', '')
@@ -261,115 +480,127 @@ class AcceptFriendRequestView(APIView):
 
     def post(self, request):
         sender_id = request.data.get('sender_id')
-        print("➡️ AcceptFriendRequestView called with sender_id:", sender_id)
 
         if not sender_id:
             return Response({'error': 'Sender ID is required'}, status=400)
 
         try:
-            friend_request = FriendRequest.objects.get(
-                sender__id=sender_id,
-                receiver=request.user,
-                status='pending'
-            )
-
-            # Create friendship both ways or however your model works
-            Friendship.objects.create(user1=friend_request.sender, user2=request.user)
-
-            # Delete friend request after creating friendship
-            friend_request.delete()
-
-            # Delete original friend request notification
-            Notification.objects.filter(
-                recipient=request.user,
-                sender__id=sender_id,
-                type='friend_request'
-            ).delete()
-
-            # Create notification to inform sender
-            Notification.objects.create(
-                recipient=friend_request.sender,
-                sender=request.user,
-                type='friend_request_accepted',
-                content=f"{request.user.username} accepted your friend request."
-            )
+            result = friend_actions.accept_friend_requests(request.user, [int(sender_id)])
+        except (TypeError, ValueError):
+            return Response({'error': 'Sender ID must be a number'}, status=400)
 
-            return Response({'message': 'Friend request accepted'}, status=200)
-
-        except FriendRequest.DoesNotExist:
+        # Already being friends isn't a pending request either.
+        if not result['accepted']:
             return Response({'error': 'Friend request not found'}, status=404)
-
-        except Exception as e:
-            print("🔥 Error in AcceptFriendRequestView:", str(e))
-            return Response({'error': str(e)}, status=500)
+        return Response({'message': 'Friend request accepted'}, status=200)
 
 class RejectFriendRequestView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
         sender_id = request.data.get('sender_id')
-        print("➡️ RejectFriendRequestView called with sender_id:", sender_id)
 
         if not sender_id:
             return Response({'error': 'Sender ID is required'}, status=400)
 
         try:
-            friend_request = FriendRequest.objects.get(
-                sender__id=sender_id,
-                receiver=request.user,
-                status='pending'
-            )
+            result = friend_actions.reject_friend_requests(request.user, [int(sender_id)])
+        except (TypeError, ValueError):
+            return Response({'error': 'Sender ID must be a number'}, status=400)
 
-            # Delete the friend request entirely
-            friend_request.delete()
+        if result['not_found']:
+            return Response({'error': 'Friend request not found'}, status=404)
+        return Response({'message': 'Friend request rejected'}, status=200)
+
+def bulk_ids(request, field):
+    """The list of ids in `field`, or an error Response."""
+    ids = request.data.get(field)
+    if not isinstance(ids, list) or not ids:
+        return None, Response({'error': f'{field} must be a non-empty list.'}, status=400)
+    if len(ids) > friend_actions.MAX_BATCH:
+        return None, Response({'error': f'At most {friend_actions.MAX_BATCH} ids per request.'}, status=400)
+    try:
+        return [int(i) for i in ids], None
+    except (TypeError, ValueError):
+        return None, Response({'error': f'{field} must contain numbers.'}, status=400)
+
+class BulkFriendRequestView(APIView):
+    """Accept or reject many incoming friend requests in one transaction."""
+    permission_classes = [IsAuthenticated]
 
-            # Delete the original friend request notification
-            Notification.objects.filter(
-                recipient=request.user,
-                sender__id=sender_id,
-                type='friend_request'
-            ).delete()
+    def post(self, request):
+        action = request.data.get('action')
+        if action not in ['accept', 'reject']:
+            return Response({'error': 'action must be accept or reject.'}, status=400)
+        sender_ids, error = bulk_ids(request, 'sender_ids')
+        if error:
+            return error
+        if action == 'accept':
+            return Response(friend_actions.accept_friend_requests(request.user, sender_ids))
+        return Response(friend_actions.reject_friend_requests(request.user, sender_ids))
 
-            return Response({'message': 'Friend request rejected'}, status=200)
+# ------------------- Friends and Invitations ----------------------
 
-        except FriendRequest.DoesNotExist:
-            return Response({'error': 'Friend request not found'}, status=404)
+def friend_ids(request):
+    """Ids of the user's friends, looked up once per batch."""
+    user = request.user
 
-        except Exception as e:
-            print("🔥 Error in RejectFriendRequestView:", str(e))
-            return Response({'error': str(e)}, status=500)
+    def load():
+        pairs = Friendship.objects.filter(Q(user1=user) | Q(user2=user)).values_list('user1_id', 'user2_id')
+        return frozenset(user2_id if user1_id == user.id else user1_id for user1_id, user2_id in pairs)
 
-# ------------------- Friends and Invitations ----------------------
+    return batch.shared(request, ('friend_ids', user.id), load)
 
 class FriendListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional_get('friends')
     def get(self, request):
-        user = request.user
-        friendships = Friendship.objects.filter(Q(user1=user) | Q(user2=user))
-        friends = [f.user2 if f.user1 == user else f.user1 for f in friendships]
-        serializer = UserSerializer(friends, many=True)
+        friends = fieldsets.prune(User.objects.filter(id__in=friend_ids(request)), UserSerializer, request)
+        serializer = UserSerializer(friends, many=True, context={'request': request})
         return Response(serializer.data)
 
-class FriendEventsAPIView(APIView):
+class FriendRecommendationsAPIView(APIView):
+    """"People you may know", read from the rows `manage.py refresh_friend_recommendations` keeps."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        friendships = Friendship.objects.filter(Q(user1=user) | Q(user2=user))
-        friend_ids = [f.user2.id if f.user1 == user else f.user1.id for f in friendships]
-        events = AttendedEvent.objects.filter(user__id__in=friend_ids).order_by('-attended_at')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), settings.FRIEND_RECOMMENDATIONS_PER_USER))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+
+        # Skip anyone befriended since the rows were computed.
+        rows = (
+            FriendRecommendation.objects.filter(user=user)
+            .exclude(candidate_id__in=friend_ids(request))
+            .select_related('candidate')
+            .order_by('-score')[:limit]
+        )
         data = [{
-            "id": event.event_id,
-            "name": event.title,
-            "date": event.date,
-            "image_url": event.image_url
-        } for event in events]
-        serializer = FriendEventSerializer(data, many=True)
-        return Response(serializer.data)
+            "id": row.candidate.id,
+            "username": row.candidate.username,
+            "avatar": row.candidate.profile_pic.url if row.candidate.profile_pic and hasattr(row.candidate.profile_pic, 'url') else None,
+            "bio": row.candidate.bio,
+            "mutual_friends": row.mutual_friends,
+            "shared_events": row.shared_events,
+            "score": row.score,
+        } for row in rows]
+        return Response(data)
+
+class FriendEventsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        events = AttendedEvent.objects.filter(user__id__in=friend_ids(request)).order_by('-attended_at')
+        # Tuples straight into FriendEventSerializer-shaped dicts; no model instances.
+        return stream_json_list(FRIEND_EVENT.values(events).iterator(chunk_size=500), FRIEND_EVENT)
 
 class FriendProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
 
     def get(self, request, friend_id):
         user = request.user
@@ -385,19 +616,30 @@ class FriendProfileAPIView(APIView):
         if not is_friend:
             return Response({"error": "Not friends."}, status=403)
 
-        user_event_ids = set(
-            AttendedEvent.objects.filter(user=user).values_list('event_id', flat=True)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.page_size)), self.max_page_size))
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=400)
+
+        # One semi-join on the (user, event_id) unique index instead of pulling
+        # the viewer's whole history into an IN (...) list. Pages are keyed on
+        # event_id, which is the index order, so deep pages cost the same.
+        mutual_events = AttendedEvent.objects.filter(
+            user=friend,
+            event_id__in=AttendedEvent.objects.filter(user=user).values('event_id'),
         )
-        friend_events = AttendedEvent.objects.filter(user=friend, event_id__in=user_event_ids)
-        mutual = [{
-            "id": e.event_id,
-            "name": e.title,
-            "date": e.date,
-            "image_url": e.image_url
-        } for e in friend_events]
+        page = mutual_events.order_by('event_id')
+        after = request.query_params.get('after')
+        if after:
+            page = page.filter(event_id__gt=after)
+        page = FRIEND_EVENT(FRIEND_EVENT.values(page)[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
 
         data = UserSerializer(friend).data
-        data['mutual_events'] = mutual
+        data['mutual_events'] = page
+        data['mutual_events_count'] = mutual_events.count()
+        data['mutual_events_next'] = page[-1]['id'] if has_more else None
         return Response(data)
 
 # ------------------- Messages ----------------------
@@ -423,8 +665,15 @@ class MessageListCreateAPIView(APIView):
             (Q(sender=user) & Q(receiver=friend)) | (Q(sender=friend) & Q(receiver=user))
         ).order_by('timestamp')
 
+        # Months compacted out of the Message table come first, already serialized.
+        history = []
+        for archive in MessageArchive.objects.filter(
+            conversation__in=Conversation.between(user, friend)
+        ).defer('payload').order_by('month'):
+            history.extend(archive.cached_messages())
+
         serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        return Response(history + serializer.data)
 
     def post(self, request, friend_id):
         user = request.user
@@ -444,27 +693,74 @@ class MessageListCreateAPIView(APIView):
         if not content:
             return Response({"error": "Message content is required."}, status=400)
 
-        message = Message.objects.create(sender=user, receiver=friend, content=content)
+        # The Conversation summary row is updated by a post_save signal; keep both in one transaction.
+        with transaction.atomic():
+            message = Message.objects.create(sender=user, receiver=friend, content=content)
         serializer = MessageSerializer(message)
         return Response(serializer.data, status=201)
 
+class InboxPagination(CursorPagination):
+    page_size = 20
+    ordering = ('-last_message_at', '-id')
+
+
+class ConversationListAPIView(generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ConversationSerializer
+    pagination_class = InboxPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            Conversation.objects
+            .filter(Q(user_low=user) | Q(user_high=user), last_message_at__isnull=False)
+            .select_related('user_low', 'user_high')
+        )
+
+class ConversationReadAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, conversation_id):
+        user = request.user
+        conversation = get_object_or_404(
+            Conversation.objects.filter(Q(user_low=user) | Q(user_high=user)), id=conversation_id
+        )
+        try:
+            up_to = int(request.data.get('up_to'))
+        except (TypeError, ValueError):
+            return Response({"error": "up_to must be a message id."}, status=400)
+
+        with transaction.atomic():
+            marked = conversation.mark_read(user, up_to)
+        return Response({"marked_read": marked, "up_to": up_to})
+
 # ------------------- Notifications ----------------------
 
 class NotificationsView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional_get('notifications')
     def get(self, request):
         user = request.user
-        notifications = Notification.objects.filter(recipient=user).order_by('-timestamp')
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        notifications = Notification.objects.filter(recipient=user).select_related('sender', 'recipient').order_by('-timestamp')
+        notifications = fieldsets.prune(notifications, NotificationSerializer, request)
+        return stream_json_list(
+            notifications.iterator(chunk_size=500),
+            lambda chunk: NotificationSerializer(chunk, many=True, context={'request': request}).data,
+        )
 
 class MarkAllNotificationsReadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
         user = request.user
-        Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+        with transaction.atomic():
+            unread = Notification.objects.filter(recipient=user, is_read=False)
+            unread_ids = list(unread.values_list('id', flat=True))
+            Notification.objects.filter(id__in=unread_ids).update(is_read=True)
+            # update() skips post_save, so bump the version stamp and log the change by hand.
+            sync.log('notifications', sync.UPSERT, [(user.id, notification_id) for notification_id in unread_ids])
+        bump('notifications', user.id)
         return Response({"message": "All notifications marked as read."}, status=status.HTTP_200_OK)
 # ------------------- Invitations (QR) ----------------------
 
@@ -473,7 +769,12 @@ class InvitationListView(generics.ListAPIView):
     serializer_class = InvitationSerializer
 
     def get_queryset(self):
-        return Invitation.objects.filter(sender=self.request.user, status='pending').order_by('-created_at')
+        invitations = Invitation.objects.filter(sender=self.request.user, status='pending').order_by('-created_at')
+        return fieldsets.prune(invitations.select_related('sender', 'receiver'), InvitationSerializer, self.request)
+
+    @conditional_get('invitations')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 class InvitationUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -493,41 +794,259 @@ class InvitationUpdateView(APIView):
         if invitation.status != 'pending':
             return Response({'detail': 'Invitation already responded to.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if action == 'accept':
-            invitation.status = 'accepted'
-            Friendship.objects.create(user1=invitation.sender, user2=invitation.receiver)
-        else:
-            invitation.status = 'ignored'
+        result = friend_actions.respond_to_invitations(request.user, [invitation.id], action)
+        if result['already_responded']:
+            return Response({'detail': 'Invitation already responded to.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        invitation.save()
+        invitation.refresh_from_db()
         serializer = InvitationSerializer(invitation)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class BulkInvitationView(APIView):
+    """Accept or ignore many received invitations in one transaction."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        action = request.data.get('action')
+        if action not in ['accept', 'ignore']:
+            return Response({'detail': 'Invalid action.'}, status=status.HTTP_400_BAD_REQUEST)
+        invitation_ids, error = bulk_ids(request, 'invitation_ids')
+        if error:
+            return error
+        return Response(friend_actions.respond_to_invitations(request.user, invitation_ids, action))
+
 class InvitationCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = InvitationSerializer
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        self.invitation = serializer.save(sender=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data.update(invitation_code(request, self.invitation))
+        return response
+
+def invitation_code(request, invitation):
+    token = invitation_tokens.issue(invitation)
+    return {
+        'token': token,
+        'qr_url': request.build_absolute_uri(reverse('invitation-qr', args=[token])),
+    }
+
+class InvitationCodeView(APIView):
+    """The sender's signed code and QR image for a pending invitation."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, invitation_id):
+        invitation = get_object_or_404(Invitation, id=invitation_id, sender=request.user, status='pending')
+        return Response(invitation_code(request, invitation))
+
+class InvitationQRImageView(APIView):
+    # The URL carries the signed token the image encodes, so it is as
+    # unguessable as the token, the image never changes, and any worker can
+    # render it without a shared cache.
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        try:
+            invitation_tokens.verify(token)
+        except invitation_tokens.InvalidInvitationToken:
+            return Response({'detail': 'QR code not found or expired.'}, status=status.HTTP_404_NOT_FOUND)
+        digest, png = invitation_tokens.qr_png(token)
+        response = HttpResponse(png, content_type='image/png')
+        response['Cache-Control'] = f'public, max-age={settings.INVITATION_TOKEN_MAX_AGE}, immutable'
+        response['ETag'] = f'"{digest}"'
+        return response
+
+class InvitationScanView(APIView):
+    """
+    Accept or ignore an invitation by scanning its QR code. The token is
+    checked from its signature alone; the invitations table only sees the
+    single conditional UPDATE of a valid, unused code.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        action = request.data.get('action', 'accept')
+        if action not in ['accept', 'ignore']:
+            return Response({'detail': 'Invalid action.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            invitation_id, sender_id, receiver_id, nonce = invitation_tokens.verify(request.data.get('token', ''))
+        except invitation_tokens.InvalidInvitationToken as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if receiver_id != request.user.id:
+            return Response({'detail': 'This invitation is for someone else.'}, status=status.HTTP_403_FORBIDDEN)
+
+        if not invitation_tokens.consume(invitation_id, nonce):
+            return Response({'detail': 'Invitation code already used.'}, status=status.HTTP_409_CONFLICT)
+
+        new_status = 'accepted' if action == 'accept' else 'ignored'
+        with transaction.atomic():
+            updated = Invitation.objects.filter(id=invitation_id, receiver_id=receiver_id, status='pending').update(
+                status=new_status, updated_at=timezone.now(),
+            )
+            if not updated:
+                return Response({'detail': 'Invitation already responded to.'}, status=status.HTTP_400_BAD_REQUEST)
+            if action == 'accept':
+                friend_actions.befriend(request.user, {sender_id})
+            sync.log('invitations', sync.UPSERT, [(sender_id, invitation_id), (receiver_id, invitation_id)])
+
+        # update() skips post_save, so bump the version stamps by hand.
+        bump('invitations', sender_id, receiver_id)
+        return Response(
+            {'id': invitation_id, 'sender': sender_id, 'receiver': receiver_id, 'status': new_status},
+            status=status.HTTP_200_OK,
+        )
 
 # ------------------- Attended Events ----------------------
 
 class AttendedEventCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional_get('attended_events')
     def get(self, request):
         events = AttendedEvent.objects.filter(user=request.user).order_by('-attended_at')
-        serializer = AttendedEventSerializer(events, many=True)
+        events = fieldsets.prune(events, AttendedEventSerializer, request)
+        serializer = AttendedEventSerializer(events, many=True, context={'request': request})
         return Response(serializer.data)
 
     def post(self, request):
         data = request.data.copy()
         serializer = AttendedEventSerializer(data=data)
         if serializer.is_valid():
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Attendance is recorded once per event; repeating it returns the existing row.
+            existing = AttendedEvent.objects.filter(user=request.user, event_id=serializer.validated_data['event_id']).first()
+            if existing is None:
+                try:
+                    with transaction.atomic():
+                        serializer.save(user=request.user)
+                    return Response(serializer.data, status=status.HTTP_201_CREATED)
+                except IntegrityError:
+                    existing = AttendedEvent.objects.get(user=request.user, event_id=serializer.validated_data['event_id'])
+            return Response(AttendedEventSerializer(existing).data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class CheckInBatchView(APIView):
+    """
+    Venue gate check-ins, many scans per request. Scanners that lost
+    connectivity upload their queue with a `batch_id` and the scan times they
+    recorded; re-sending a batch returns the first result instead of
+    processing it again.
+    """
+    permission_classes = [IsAuthenticated]
+    # Each request already carries up to CHECK_IN_BATCH_MAX scans.
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = 'check_in'
+
+    def post(self, request):
+        batch_id = str(request.data.get('batch_id') or '')[:100]
+        replayed = check_ins.replayed_batch(request.user.id, batch_id)
+        if replayed is not None:
+            return Response({**replayed, 'replayed': True}, status=status.HTTP_200_OK)
+
+        scans = request.data.get('check_ins')
+        if not isinstance(scans, list) or not scans:
+            return Response({"error": "check_ins must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > settings.CHECK_IN_BATCH_MAX:
+            return Response(
+                {"error": f"At most {settings.CHECK_IN_BATCH_MAX} check-ins per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Event details shared by every scan can be sent once as `event`.
+        defaults = request.data.get('event') or {}
+        if not isinstance(defaults, dict):
+            return Response({"error": "event must be an object."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CheckInSerializer(
+            data=[{**defaults, **scan} if isinstance(scan, dict) else scan for scan in scans], many=True,
+        )
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        scans = serializer.validated_data
+
+        event_ids = {scan['event_id'] for scan in scans}
+        if not request.user.is_staff:
+            # Organizers may check people in to their own events only.
+            local_ids = {int(event_id) for event_id in event_ids if event_id.isdigit()}
+            if len(local_ids) != len(event_ids) or Event.objects.filter(
+                id__in=local_ids, created_by=request.user,
+            ).count() != len(local_ids):
+                return Response({"error": "You can only check people in to your own events."}, status=status.HTTP_403_FORBIDDEN)
+
+        user_ids = {scan['user'] for scan in scans}
+        known = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        now = timezone.now()
+        rows, unknown = [], []
+        for index, scan in enumerate(scans):
+            if scan['user'] not in known:
+                unknown.append(index)
+                continue
+            rows.append({
+                'user_id': scan['user'],
+                'event_id': scan['event_id'],
+                'title': scan['title'],
+                'date': scan['date'],
+                'image_url': scan['image_url'],
+                'city': scan['city'],
+                'attended_at': min(scan.get('scanned_at') or now, now),
+            })
+
+        created, duplicates = check_ins.record_check_ins(rows)
+        result = {'checked_in': len(created), 'duplicates': duplicates, 'unknown_users': unknown}
+        check_ins.remember_batch(request.user.id, batch_id, result)
+        return Response(result, status=status.HTTP_200_OK)
+
+# ------------------- Delta Sync ----------------------
+
+class SyncView(APIView):
+    """
+    Everything that changed for the user since `?since=<version>` in one
+    response, or a full snapshot (`"full": true`) when there is no usable
+    version. Clients store the returned version for the next call.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        since = request.query_params.get('since')
+        version = sync.read_token(user, since) if since else None
+        result = sync.changes_since(user, version) if version is not None else None
+        full = result is None
+        if full:
+            result = sync.snapshot(user)
+        new_version, changes = result
+        return Response({
+            "version": sync.make_token(user, new_version),
+            "full": full,
+            "changes": changes,
+        })
+
+# ------------------- Batch Requests ----------------------
+
+class BatchView(APIView):
+    """
+    POST {"requests": [{"id", "method", "path", "body", "headers"}, ...]} and
+    get every response back in one {"responses": [...]} body. See core.batch.
+    """
+    permission_classes = [IsAuthenticated]
+    # Each sub-request is throttled by its own view, as if sent on its own.
+    throttle_classes = []
+
+    def post(self, request):
+        specs = request.data.get('requests')
+        if not isinstance(specs, list) or not specs:
+            return Response({"error": "requests must be a non-empty list."}, status=400)
+        if len(specs) > settings.BATCH_MAX_REQUESTS:
+            return Response({"error": f"At most {settings.BATCH_MAX_REQUESTS} requests per batch."}, status=400)
+        try:
+            results = batch.execute(request._request, request.user, specs)
+        except batch.InvalidSubRequest as exc:
+            return Response({"error": str(exc)}, status=400)
+        return HttpResponse(batch.encode(results), content_type='application/json')
+
 # ------------------- Friendship Removal (Unfriend) ----------------------
 
 class FriendDeleteAPIView(APIView):
@@ -554,7 +1073,7 @@ class FriendDeleteAPIView(APIView):
 # # sourcing events 
 class TicketmasterProxyView(APIView):
     permission_classes = [AllowAny]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]  # Add throttling here
+    throttle_scope = 'proxy'
 
     def get(self, request):
         params = {
@@ -575,15 +1094,17 @@ class TicketmasterProxyView(APIView):
             "Origin": "https://app.ticketmaster.com",
         }
         try:
-            response = requests.get(settings.TICKETMASTER_API_URL, params=params, headers=headers)
-            return Response(response.json(), status=response.status_code)
+            response = governed_get('ticketmaster', settings.TICKETMASTER_API_URL, priority=SEARCH, params=params, headers=headers)
+            return passthrough_response(response)
+        except QuotaExceeded as e:
+            return upstream_busy(e)
         except requests.exceptions.RequestException as e:
             return Response({"error": "Failed to fetch data from Ticketmaster.", "details": str(e)}, status=500)
 
 
 class TicketmasterEventDetailProxyView(APIView):
     permission_classes = [AllowAny]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]  # Add throttling here
+    throttle_scope = 'proxy'
 
     def get(self, request, event_id):
         url = f"{settings.TICKETMASTER_API_URL.rstrip('/')}/{event_id}.json"
@@ -600,7 +1121,9 @@ class TicketmasterEventDetailProxyView(APIView):
             "Origin": "https://app.ticketmaster.com",
         }
         try:
-            response = requests.get(url, params=params, headers=headers)
-            return Response(response.json(), status=response.status_code)
+            response = governed_get('ticketmaster', url, priority=DETAIL, params=params, headers=headers)
+            return passthrough_response(response)
+        except QuotaExceeded as e:
+            return upstream_busy(e)
         except requests.exceptions.RequestException as e:
             return Response({"error": "Failed to fetch event details.", "details": str(e)}, status=500)
\ No newline at end of file
@@ -0,0 +1,23 @@
+import functools
+
+from decouple import config
+from django.conf import settings
+
+
+@functools.cache
+def stripe_client():
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+@functools.cache
+def mpesa_settings():
+    return {
+        'shortcode': config('MPESA_SHORTCODE'),
+        'passkey': config('PASS_KEY'),
+        'callback_url': config('MPESA_CALLBACK_URL'),
+        # Appended to the callback URL as ?secret=; callbacks without it are refused.
+        'callback_secret': config('MPESA_CALLBACK_SECRET', default=''),
+    }
@@ -0,0 +1,136 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import TicketHold, TicketShard
+
+
+class SoldOut(Exception):
+    pass
+
+
+def ensure_inventory(event):
+    """Create the event's shards from its ticket_capacity the first time tickets are held."""
+    shards = list(TicketShard.objects.filter(event=event))
+    if shards or not event.ticket_capacity:
+        return shards
+
+    count = max(1, min(settings.TICKET_INVENTORY_SHARDS, event.ticket_capacity))
+    base, extra = divmod(event.ticket_capacity, count)
+    TicketShard.objects.bulk_create(
+        [TicketShard(event=event, shard=i, capacity=base + (i < extra)) for i in range(count)],
+        ignore_conflicts=True,
+    )
+    return list(TicketShard.objects.filter(event=event))
+
+
+def _reserve(shard_id, quantity):
+    # A single conditional UPDATE: the row lock is held for one statement and the
+    # WHERE clause makes overselling impossible however many buyers race.
+    return TicketShard.objects.filter(
+        id=shard_id, capacity__gte=F('reserved') + F('sold') + quantity,
+    ).update(reserved=F('reserved') + quantity)
+
+
+@transaction.atomic
+def _consolidate(event, quantity):
+    """
+    Slow path when no single shard has `quantity` left but the event as a
+    whole might: lock every shard and move free capacity onto one of them.
+    """
+    shards = list(TicketShard.objects.select_for_update().filter(event=event).order_by('shard'))
+    free = [s.capacity - s.reserved - s.sold for s in shards]
+    if sum(free) < quantity:
+        return None
+    target = shards[free.index(max(free))]
+    for shard, spare in zip(shards, free):
+        if shard is not target and spare:
+            shard.capacity -= spare
+            target.capacity += spare
+            shard.save(update_fields=['capacity'])
+    target.save(update_fields=['capacity'])
+    return target.id
+
+
+def hold_tickets(event, user, quantity):
+    """Atomically set aside `quantity` tickets for TICKET_HOLD_MINUTES, or raise SoldOut."""
+    shard_ids = [s.id for s in ensure_inventory(event)]
+    if not shard_ids:
+        raise SoldOut("This event has no tickets for sale.")
+
+    random.shuffle(shard_ids)
+    # Reserve and record the hold together: if creating it fails for any
+    # reason the reservation is rolled back with it.
+    with transaction.atomic():
+        taken = next((shard_id for shard_id in shard_ids if _reserve(shard_id, quantity)), None)
+        if taken is None:
+            taken = _consolidate(event, quantity)
+            if taken is None or not _reserve(taken, quantity):
+                raise SoldOut("Not enough tickets left.")
+
+        return TicketHold.objects.create(
+            event=event, shard_id=taken, user=user, quantity=quantity,
+            expires_at=timezone.now() + timedelta(minutes=settings.TICKET_HOLD_MINUTES),
+        )
+
+
+def _transition(hold, to_status, shard_update):
+    with transaction.atomic():
+        # Only the caller that flips the hold out of 'pending' touches the shard.
+        if not TicketHold.objects.filter(id=hold.id, status='pending').update(status=to_status):
+            return False
+        TicketShard.objects.filter(id=hold.shard_id).update(**shard_update)
+    hold.status = to_status
+    return True
+
+
+def confirm_hold(hold, payment_reference=''):
+    """Turn a pending hold into sold tickets once its payment succeeds."""
+    if payment_reference and hold.payment_reference != payment_reference:
+        TicketHold.objects.filter(id=hold.id).update(payment_reference=payment_reference)
+    if _transition(hold, 'confirmed', {'reserved': F('reserved') - hold.quantity, 'sold': F('sold') + hold.quantity}):
+        return True
+    hold.refresh_from_db(fields=['status'])
+    if hold.status not in ('expired', 'released'):
+        return False
+
+    # Paid after the hold lapsed: sell only if the tickets are still there.
+    with transaction.atomic():
+        if not TicketHold.objects.filter(id=hold.id, status=hold.status).update(status='confirmed'):
+            return False
+        if not TicketShard.objects.filter(
+            id=hold.shard_id, capacity__gte=F('reserved') + F('sold') + hold.quantity,
+        ).update(sold=F('sold') + hold.quantity):
+            transaction.set_rollback(True)
+            return False
+    hold.status = 'confirmed'
+    return True
+
+
+def release_hold(hold, status='released'):
+    return _transition(hold, status, {'reserved': F('reserved') - hold.quantity})
+
+
+def release_expired(now=None, batch_size=500):
+    """Return lapsed holds to the pool; used by `manage.py release_expired_holds`."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        batch = list(TicketHold.objects.filter(status='pending', expires_at__lt=now)[:batch_size])
+        for hold in batch:
+            released += release_hold(hold, 'expired')
+        if len(batch) < batch_size:
+            return released
+
+
+def availability(event):
+    totals = TicketShard.objects.filter(event=event).aggregate(
+        capacity=Sum('capacity'), reserved=Sum('reserved'), sold=Sum('sold'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['available'] = totals['capacity'] - totals['reserved'] - totals['sold']
+    return totals
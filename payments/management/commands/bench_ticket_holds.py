@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from core.models import Event
+from payments.inventory import SoldOut, availability, confirm_hold, hold_tickets, release_hold
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Flash-sale benchmark: many concurrent buyers race for a small ticket "
+        "pool. Fails if a single ticket is oversold. Creates (and deletes) its own event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=2000)
+        parser.add_argument('--capacity', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--abandon-rate', type=float, default=0.2)
+
+    def handle(self, *args, buyers, capacity, threads, max_quantity, abandon_rate, **options):
+        user, _ = User.objects.get_or_create(username='ticket-bench', defaults={'email': 'ticket-bench@example.com'})
+        event = Event.objects.create(
+            title='Ticket benchmark', description='', date=timezone.now(), location='bench',
+            created_by=user, ticket_price=100, ticket_capacity=capacity,
+        )
+
+        outcome = {'held': 0, 'sold_out': 0, 'retries': 0, 'tickets': 0}
+        lock = threading.Lock()
+
+        def count(key, n=1):
+            with lock:
+                outcome[key] += n
+
+        def buy(_):
+            quantity = random.randint(1, max_quantity)
+            for _attempt in range(20):
+                try:
+                    hold = hold_tickets(event, user, quantity)
+                except SoldOut:
+                    count('sold_out')
+                    return
+                except OperationalError:
+                    # SQLite serializes writers; Postgres never takes this path.
+                    count('retries')
+                    time.sleep(0.01)
+                    continue
+                else:
+                    break
+            else:
+                return
+            count('held')
+            if random.random() < abandon_rate:
+                release_hold(hold)
+            else:
+                confirm_hold(hold)
+                count('tickets', quantity)
+
+        def worker(i):
+            try:
+                buy(i)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(buyers)))
+        elapsed = time.perf_counter() - started
+
+        totals = availability(event)
+        self.stdout.write(
+            f"{buyers} buyers / {threads} threads in {elapsed:.2f}s ({buyers / elapsed:.0f} buyers/s): "
+            f"{outcome['held']} holds, {outcome['sold_out']} sold out, {outcome['retries']} lock retries"
+        )
+        self.stdout.write(
+            f"capacity={totals['capacity']} sold={totals['sold']} reserved={totals['reserved']} "
+            f"available={totals['available']} tickets confirmed by buyers={outcome['tickets']}"
+        )
+
+        oversold = totals['sold'] + totals['reserved'] > capacity or totals['sold'] != outcome['tickets']
+        with transaction.atomic():
+            event.delete()
+        if oversold:
+            raise CommandError("Oversell detected.")
+        self.stdout.write(self.style.SUCCESS("Zero oversell."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payments.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return tickets from lapsed, unpaid holds to their events' inventory. Run every minute."
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired ticket holds."))
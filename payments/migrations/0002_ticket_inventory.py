@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:58
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_event_ticket_capacity'),
+        ('payments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('reserved', models.PositiveIntegerField(default=0)),
+                ('sold', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_shards', to='core.event')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TicketHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('released', 'Released'), ('expired', 'Expired')], default='pending', max_length=10)),
+                ('payment_reference', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_holds', to='core.event')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='payments.ticketshard')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ticketshard',
+            constraint=models.CheckConstraint(condition=models.Q(('reserved__lte', django.db.models.expressions.CombinedExpression(models.F('capacity'), '-', models.F('sold')))), name='ticket_shard_not_oversold'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ticketshard',
+            unique_together={('event', 'shard')},
+        ),
+        migrations.AddIndex(
+            model_name='tickethold',
+            index=models.Index(fields=['status', 'expires_at'], name='ticket_hold_expiry'),
+        ),
+    ]
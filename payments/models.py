@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from core.models import Event
 
 User = get_user_model()
 
@@ -37,3 +38,56 @@ class PaymentTransaction(models.Model):
 
     def __str__(self):
         return f"{self.user or 'Anonymous'} - {self.payment_method} - {self.status}"
+
+
+class TicketShard(models.Model):
+    # An event's capacity is split over several rows so concurrent buyers lock
+    # different rows instead of queueing on one counter (see payments.inventory).
+    event = models.ForeignKey(Event, related_name='ticket_shards', on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0)
+    sold = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'shard')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(reserved__lte=models.F('capacity') - models.F('sold')),
+                name='ticket_shard_not_oversold',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event} shard {self.shard}: {self.sold + self.reserved}/{self.capacity}"
+
+
+class TicketHold(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    )
+
+    event = models.ForeignKey(Event, related_name='ticket_holds', on_delete=models.CASCADE)
+    shard = models.ForeignKey(TicketShard, related_name='holds', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Stripe PaymentIntent id or M-Pesa CheckoutRequestID, whichever paid for it.
+    payment_reference = models.CharField(max_length=255, blank=True, db_index=True)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='ticket_hold_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.event} for {self.user or 'Anonymous'} - {self.status}"
+
+    @property
+    def amount(self):
+        return self.event.ticket_price * self.quantity
@@ -1,3 +1,191 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Event, User
+from .inventory import SoldOut, availability, confirm_hold, hold_tickets, release_expired, release_hold
+from .models import TicketHold, TicketShard
+
+
+@override_settings(TICKET_INVENTORY_SHARDS=4)
+class TicketInventoryTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@example.com', password='pw')
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        self.event = Event.objects.create(
+            title='Gig', description='', date=timezone.now() + timedelta(days=7), location='Nairobi',
+            created_by=self.organizer, ticket_price='150.50', ticket_capacity=10,
+        )
+
+    def test_capacity_is_split_over_shards(self):
+        hold_tickets(self.event, self.buyer, 1)
+        self.assertEqual(
+            sorted(TicketShard.objects.filter(event=self.event).values_list('capacity', flat=True)), [2, 2, 3, 3],
+        )
+
+    def test_holds_never_oversell(self):
+        for _ in range(5):
+            hold_tickets(self.event, self.buyer, 2)
+        with self.assertRaises(SoldOut):
+            hold_tickets(self.event, self.buyer, 1)
+        self.assertEqual(availability(self.event), {'capacity': 10, 'reserved': 10, 'sold': 0, 'available': 0})
+
+    def test_hold_larger_than_any_shard_consolidates_capacity(self):
+        hold = hold_tickets(self.event, self.buyer, 7)
+        self.assertEqual(hold.shard.reserved, 7)
+        self.assertEqual(availability(self.event)['available'], 3)
+        with self.assertRaises(SoldOut):
+            hold_tickets(self.event, self.buyer, 4)
+
+    def test_failed_hold_creation_rolls_back_the_reservation(self):
+        with mock.patch.object(TicketHold.objects, 'create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                hold_tickets(self.event, self.buyer, 3)
+        self.assertEqual(availability(self.event)['reserved'], 0)
+
+    def test_confirm_moves_reserved_to_sold_once(self):
+        hold = hold_tickets(self.event, self.buyer, 3)
+        self.assertTrue(confirm_hold(hold, 'ws_CO_1'))
+        self.assertFalse(confirm_hold(hold))
+        self.assertFalse(release_hold(hold))
+        self.assertEqual(availability(self.event), {'capacity': 10, 'reserved': 0, 'sold': 3, 'available': 7})
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.payment_reference), ('confirmed', 'ws_CO_1'))
+
+    def test_release_returns_tickets(self):
+        hold = hold_tickets(self.event, self.buyer, 4)
+        self.assertTrue(release_hold(hold))
+        self.assertEqual(availability(self.event)['available'], 10)
+
+    def test_late_payment_sells_only_if_tickets_remain(self):
+        hold = hold_tickets(self.event, self.buyer, 6)
+        TicketHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired(), 1)
+
+        # Paid after expiry, tickets still free: sold.
+        self.assertTrue(confirm_hold(hold))
+        self.assertEqual(availability(self.event)['sold'], 6)
+
+        late = hold_tickets(self.event, self.buyer, 4)
+        release_hold(late, 'expired')
+        hold_tickets(self.event, self.buyer, 4)
+        # Paid after expiry, tickets gone to someone else: not sold.
+        self.assertFalse(confirm_hold(late))
+        self.assertEqual(availability(self.event), {'capacity': 10, 'reserved': 4, 'sold': 6, 'available': 0})
+
+
+@override_settings(TICKET_INVENTORY_SHARDS=1)
+class MpesaCallbackTests(TestCase):
+    URL = '/api/payments/mpesa-callback/'
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='organizer@example.com', password='pw')
+        event = Event.objects.create(
+            title='Gig', description='', date=timezone.now() + timedelta(days=7), location='Nairobi',
+            created_by=organizer, ticket_price='100', ticket_capacity=5,
+        )
+        self.hold = hold_tickets(event, None, 2)
+        TicketHold.objects.filter(id=self.hold.id).update(payment_reference='ws_CO_42')
+        patcher = mock.patch('payments.views.mpesa_settings', return_value={'callback_secret': 's3cret'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def callback(self, result_code=0, secret='s3cret'):
+        body = {'Body': {'stkCallback': {
+            'CheckoutRequestID': 'ws_CO_42', 'ResultCode': result_code, 'ResultDesc': 'done',
+            'CallbackMetadata': {'Item': [{'Name': 'Amount', 'Value': 200}, {'Name': 'PhoneNumber', 'Value': 254700000000}]},
+        }}}
+        return self.client.post(f'{self.URL}?secret={secret}', body, content_type='application/json')
+
+    def status(self):
+        self.hold.refresh_from_db()
+        return self.hold.status
+
+    def test_wrong_secret_is_rejected(self):
+        with mock.patch('payments.views.stk_push_paid') as paid:
+            self.assertEqual(self.callback(secret='guess').status_code, 403)
+        paid.assert_not_called()
+        self.assertEqual(self.status(), 'pending')
+
+    def test_success_confirmed_by_stk_query_sells_the_hold(self):
+        with mock.patch('payments.views.stk_push_paid', return_value=True) as paid:
+            self.callback()
+        paid.assert_called_once_with('ws_CO_42')
+        self.assertEqual(self.status(), 'confirmed')
+
+    def test_success_not_confirmed_by_stk_query_leaves_the_hold(self):
+        with mock.patch('payments.views.stk_push_paid', return_value=False):
+            self.callback()
+        self.assertEqual(self.status(), 'pending')
+
+    def test_failed_payment_releases_the_hold(self):
+        with mock.patch('payments.views.stk_push_paid') as paid:
+            self.callback(result_code=1032)
+        paid.assert_not_called()
+        self.assertEqual(self.status(), 'released')
+
+
+@override_settings(TICKET_INVENTORY_SHARDS=1, STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookTests(TestCase):
+    URL = '/api/payments/stripe-webhook/'
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='organizer@example.com', password='pw')
+        event = Event.objects.create(
+            title='Gig', description='', date=timezone.now() + timedelta(days=7), location='Nairobi',
+            created_by=organizer, ticket_price='150.50', ticket_capacity=5,
+        )
+        self.hold = hold_tickets(event, None, 2)
+
+    def webhook(self, secret='whsec_test', currency='kes', amount_received=30100):
+        payload = json.dumps({
+            'id': 'evt_1', 'object': 'event', 'type': 'payment_intent.succeeded',
+            'data': {'object': {
+                'id': 'pi_1', 'object': 'payment_intent', 'currency': currency,
+                'amount_received': amount_received, 'metadata': {'hold_id': str(self.hold.id)},
+            }},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            self.URL, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}',
+        )
+
+    def status(self):
+        self.hold.refresh_from_db()
+        return self.hold.status
+
+    def test_signed_payment_covering_the_hold_confirms_it(self):
+        self.assertEqual(self.webhook().status_code, 200)
+        self.assertEqual(self.status(), 'confirmed')
+
+    def test_forged_signature_is_rejected(self):
+        self.assertEqual(self.webhook(secret='whsec_guess').status_code, 400)
+        self.assertEqual(self.status(), 'pending')
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='')
+    def test_unconfigured_secret_refuses_events_signed_with_an_empty_key(self):
+        self.assertEqual(self.webhook(secret='').status_code, 503)
+        self.assertEqual(self.status(), 'pending')
+
+    def test_other_currency_or_short_payment_does_not_confirm(self):
+        self.webhook(currency='usd')
+        self.assertEqual(self.status(), 'pending')
+        self.webhook(amount_received=30099)
+        self.assertEqual(self.status(), 'pending')
+
+    def test_payment_intent_for_a_hold_is_always_in_kes(self):
+        with mock.patch('payments.views.stripe_client') as stripe:
+            stripe.return_value.PaymentIntent.create.return_value = mock.Mock(id='pi_2', client_secret='cs')
+            self.client.post(
+                '/api/payments/create-payment-intent/', {'hold_id': self.hold.id, 'currency': 'UGX'},
+                content_type='application/json',
+            )
+        kwargs = stripe.return_value.PaymentIntent.create.call_args.kwargs
+        self.assertEqual((kwargs['currency'], kwargs['amount']), ('kes', 30100))
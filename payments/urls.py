@@ -4,6 +4,8 @@ from .views import (
     InitiateStkPushView,
     MpesaCallbackView,
     UserTransactionsView,
+    TicketHoldView,
+    StripeWebhookView,
 )
 
 urlpatterns = [
@@ -11,4 +13,6 @@ urlpatterns = [
     path('payments/create-payment-intent/', StripeCreatePaymentIntentView.as_view(), name='create-payment-intent'),
     path('payments/mpesa-callback/', MpesaCallbackView.as_view(), name='mpesa-callback'),
     path('payments/user-transactions/', UserTransactionsView.as_view(), name='user-transactions'),
+    path('payments/stripe-webhook/', StripeWebhookView.as_view(), name='stripe-webhook'),
+    path('payments/events/<int:event_id>/tickets/', TicketHoldView.as_view(), name='ticket-holds'),
 ]
@@ -5,9 +5,6 @@ from decouple import config
 
 
 
-CONSUMER_KEY = config('CONSUMER_KEY')
-CONSUMER_SECRET = config('CONSUMER_SECRET')
-
 cached_token = None
 token_expiry = 0
 
@@ -19,7 +16,7 @@ def get_access_token():
         return cached_token
 
     try:
-        credentials = f"{CONSUMER_KEY}:{CONSUMER_SECRET}"
+        credentials = f"{config('CONSUMER_KEY')}:{config('CONSUMER_SECRET')}"
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
 
         headers = {
@@ -43,4 +40,42 @@ def get_access_token():
 
     except Exception as e:
         print("Access Token Exception:", str(e))
-        return None
\ No newline at end of file
+        return None
+
+def stk_password(timestamp):
+    from payments.clients import mpesa_settings
+
+    mpesa = mpesa_settings()
+    return base64.b64encode(f"{mpesa['shortcode']}{mpesa['passkey']}{timestamp}".encode()).decode()
+
+
+def stk_push_paid(checkout_request_id):
+    """
+    Ask Daraja's STK Push Query API whether `checkout_request_id` was paid.
+    The callback body is unauthenticated, so it is never trusted on its own.
+    Returns None when Daraja can't be reached or hasn't settled the request yet.
+    """
+    from payments.clients import mpesa_settings
+
+    token = get_access_token()
+    if not token:
+        return None
+    timestamp = time.strftime('%Y%m%d%H%M%S')
+    try:
+        response = requests.post(
+            'https://sandbox.safaricom.co.ke/mpesa/stkpushquery/v1/query',
+            json={
+                "BusinessShortCode": mpesa_settings()['shortcode'],
+                "Password": stk_password(timestamp),
+                "Timestamp": timestamp,
+                "CheckoutRequestID": checkout_request_id,
+            },
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=30,
+        )
+        data = response.json()
+    except (requests.RequestException, ValueError):
+        return None
+    if 'ResultCode' not in data:
+        return None
+    return str(data['ResultCode']) == '0'
@@ -5,29 +5,27 @@ from rest_framework.decorators import permission_classes
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
+import hmac
 import json
+import logging
 import requests
 import datetime
-import base64
-from decouple import config
-import stripe
+from decimal import ROUND_CEILING, Decimal, InvalidOperation
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import PaymentTransaction
-from payments.utils.daraja import get_access_token
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from core.models import Event
+from .models import PaymentTransaction, TicketHold
+from .clients import mpesa_settings, stripe_client
+from .inventory import SoldOut, availability, confirm_hold, hold_tickets, release_hold
+from payments.utils.daraja import get_access_token, stk_password, stk_push_paid
 
 User = get_user_model()
 
-# Load config variables
-STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
-STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
-
-MPESA_SHORTCODE = config('MPESA_SHORTCODE')
-MPESA_PASSKEY = config('PASS_KEY')
-MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL')
-          
-# Initialize Stripe
-stripe.api_key = STRIPE_SECRET_KEY
+logger = logging.getLogger(__name__)
 
 
 def normalize_phone(phone: str) -> str:
@@ -39,29 +37,100 @@ def normalize_phone(phone: str) -> str:
     return phone
 
 
+def minor_units(amount):
+    """`amount` in Stripe's smallest currency unit, rounded up rather than undercharging."""
+    return int((Decimal(str(amount)) * 100).to_integral_value(rounding=ROUND_CEILING))
+
+
+def get_pending_hold(request):
+    """
+    The caller's live ticket hold named by `hold_id`, if any. Returns
+    (hold, error_response); both are None when no hold_id was sent.
+    """
+    hold_id = request.data.get('hold_id')
+    if not hold_id:
+        return None, None
+    hold = TicketHold.objects.select_related('event').filter(
+        id=hold_id, status='pending', expires_at__gt=timezone.now()
+    ).first()
+    if hold is None or (hold.user_id and hold.user_id != request.user.id):
+        return None, Response({'error': 'Ticket hold not found or expired'}, status=404)
+    return hold, None
+
+
+# ------------------- Ticket Holds ----------------------
+
+class TicketHoldView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'payments'
+
+    def get(self, request, event_id):
+        event = get_object_or_404(Event, id=event_id)
+        return Response(availability(event))
+
+    def post(self, request, event_id):
+        event = get_object_or_404(Event, id=event_id)
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity <= 0 or quantity > settings.TICKET_HOLD_MAX_QUANTITY:
+            return Response({'error': f'Quantity must be between 1 and {settings.TICKET_HOLD_MAX_QUANTITY}'}, status=400)
+
+        try:
+            hold = hold_tickets(event, request.user, quantity)
+        except SoldOut as e:
+            return Response({'error': str(e)}, status=409)
+
+        return Response({
+            'hold_id': hold.id,
+            'quantity': hold.quantity,
+            'amount': hold.amount,
+            'expires_at': hold.expires_at,
+        }, status=201)
+
+    def delete(self, request, event_id):
+        hold = get_object_or_404(TicketHold, id=request.data.get('hold_id'), event_id=event_id, user=request.user)
+        if not release_hold(hold):
+            return Response({'error': 'Hold is no longer pending'}, status=400)
+        return Response({'message': 'Hold released'})
+
+
+# ------------------- Payments ----------------------
+
 @permission_classes([AllowAny])
 class StripeCreatePaymentIntentView(APIView):
+    throttle_scope = 'payments'
+
     def post(self, request):
         try:
-            amount = request.data.get('amount')
-            currency = request.data.get('currency', 'KES').lower()  # default KES
+            hold, error = get_pending_hold(request)
+            if error:
+                return error
+
+            amount = hold.amount if hold else request.data.get('amount')
+            # Ticket prices are in KES: a hold is never paid for in another currency.
+            currency = 'kes' if hold else request.data.get('currency', 'KES').lower()  # default KES
 
             if not amount:
                 return Response({'error': 'Amount is required'}, status=400)
 
             # Stripe expects amount in the smallest currency unit (e.g. cents)
             # For KES, which has no decimals, multiply by 100 to convert to cents-like unit
-            amount_in_smallest_unit = int(float(amount) * 100)
+            amount_in_smallest_unit = minor_units(amount)
 
-            intent = stripe.PaymentIntent.create(
+            intent = stripe_client().PaymentIntent.create(
                 amount=amount_in_smallest_unit,
                 currency=currency,
                 payment_method_types=["card"],
+                metadata={'hold_id': hold.id} if hold else {},
             )
+            if hold:
+                TicketHold.objects.filter(id=hold.id).update(payment_reference=intent.id)
 
             return Response({
                 'clientSecret': intent.client_secret,
-                'publishableKey': STRIPE_PUBLISHABLE_KEY,
+                'publishableKey': settings.STRIPE_PUBLISHABLE_KEY,
             })
         except Exception as e:
             return Response({'error': str(e)}, status=500)
@@ -69,27 +138,42 @@ class StripeCreatePaymentIntentView(APIView):
 
 @permission_classes([AllowAny])
 class InitiateStkPushView(APIView):
+    throttle_scope = 'payments'
+
     def post(self, request):
         try:
+            hold, error = get_pending_hold(request)
+            if error:
+                return error
+
             phone = normalize_phone(request.data.get('phone'))
-            amount = int(request.data.get('amount', 0))
+            try:
+                amount = Decimal(hold.amount if hold else str(request.data.get('amount', 0)))
+            except InvalidOperation:
+                return Response({'error': 'Amount must be a number'}, status=400)
+            # M-Pesa only takes whole shillings: round up rather than undercharge.
+            amount = int(amount.to_integral_value(rounding=ROUND_CEILING)) if amount.is_finite() else 0
 
             if not phone or amount <= 0:
                 return Response({'error': 'Phone number and positive amount are required'}, status=400)
 
+            mpesa = mpesa_settings()
             timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            password = base64.b64encode(f'{MPESA_SHORTCODE}{MPESA_PASSKEY}{timestamp}'.encode()).decode()
+            password = stk_password(timestamp)
+            callback_url = mpesa['callback_url']
+            if mpesa['callback_secret']:
+                callback_url += ('&' if '?' in callback_url else '?') + urlencode({'secret': mpesa['callback_secret']})
 
             payload = {
-                "BusinessShortCode": MPESA_SHORTCODE,
+                "BusinessShortCode": mpesa['shortcode'],
                 "Password": password,
                 "Timestamp": timestamp,
                 "TransactionType": "CustomerPayBillOnline",
                 "Amount": amount,
                 "PartyA": phone,
-                "PartyB": MPESA_SHORTCODE,
+                "PartyB": mpesa['shortcode'],
                 "PhoneNumber": phone,
-                "CallBackURL": MPESA_CALLBACK_URL,
+                "CallBackURL": callback_url,
                 "AccountReference": "WapiNaLiniTicket",
                 "TransactionDesc": "Wapi Na Lini Ticket Payment"
             }
@@ -110,7 +194,13 @@ class InitiateStkPushView(APIView):
                 timeout=30
             )
 
-            return Response(mpesa_response.json())
+            data = mpesa_response.json()
+            if hold and data.get('CheckoutRequestID'):
+                TicketHold.objects.filter(id=hold.id).update(payment_reference=data['CheckoutRequestID'])
+            # The request ids are what a callback names; they stay server-side.
+            data.pop('CheckoutRequestID', None)
+            data.pop('MerchantRequestID', None)
+            return Response(data)
 
         except Exception as e:
             return Response({'error': 'Failed to initiate payment', 'details': str(e)}, status=500)
@@ -122,6 +212,9 @@ class MpesaCallbackView(APIView):
 
     @csrf_exempt
     def post(self, request):
+        secret = mpesa_settings()['callback_secret']
+        if secret and not hmac.compare_digest(request.query_params.get('secret', '').encode(), secret.encode()):
+            return Response({'error': 'Invalid callback'}, status=403)
         try:
             body = request.data
             stk = body.get('Body', {}).get('stkCallback', {})
@@ -132,6 +225,17 @@ class MpesaCallbackView(APIView):
 
             transaction_data = {item['Name']: item.get('Value') for item in metadata}
 
+            hold = TicketHold.objects.filter(payment_reference=checkout_request_id).first() if checkout_request_id else None
+            if hold:
+                if result_code != 0:
+                    release_hold(hold)
+                elif stk_push_paid(checkout_request_id):
+                    confirm_hold(hold)
+                else:
+                    # Forged, or Daraja couldn't confirm it yet: the hold is left to
+                    # expire rather than handing out tickets on the callback's word.
+                    logger.warning('M-Pesa callback for hold %s not confirmed by STK query', hold.id)
+
             phone = normalize_phone(transaction_data.get('PhoneNumber'))
             matched_user = User.objects.filter(phone=phone).first()  # Adjust if phone stored differently
 
@@ -154,6 +258,42 @@ class MpesaCallbackView(APIView):
             return Response({'error': 'Invalid callback data', 'details': str(e)}, status=400)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class StripeWebhookView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = []
+
+    def post(self, request):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            # Without a secret any payload "verifies": refuse rather than trust it.
+            logger.error('Stripe webhook received but STRIPE_WEBHOOK_SECRET is not set')
+            return Response({'error': 'Webhook not configured'}, status=503)
+        stripe = stripe_client()
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''), settings.STRIPE_WEBHOOK_SECRET
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response({'error': 'Invalid webhook'}, status=400)
+
+        intent = event['data']['object']
+        hold_id = (intent.get('metadata') or {}).get('hold_id')
+        hold = TicketHold.objects.select_related('event').filter(id=hold_id).first() if hold_id else None
+        if hold:
+            if event['type'] == 'payment_intent.succeeded':
+                if intent.get('currency') == 'kes' and (intent.get('amount_received') or 0) >= minor_units(hold.amount):
+                    confirm_hold(hold, payment_reference=intent['id'])
+                else:
+                    logger.warning(
+                        'Stripe payment %s for hold %s does not cover it: %s %s',
+                        intent['id'], hold.id, intent.get('amount_received'), intent.get('currency'),
+                    )
+            elif event['type'] in ('payment_intent.payment_failed', 'payment_intent.canceled'):
+                release_hold(hold)
+        return Response({'received': True})
+
+
 @permission_classes([IsAuthenticated])
 class UserTransactionsView(APIView):
     def get(self, request):
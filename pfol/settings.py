@@ -10,16 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from pathlib import Path
 from datetime import timedelta
-import cloudinary
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -54,12 +56,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestProfilerMiddleware',
+    'core.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -100,9 +105,26 @@ ASGI_APPLICATION = 'pfol.asgi.application'
 # }
 
 DATABASES = {
-    'default' :dj_database_url.parse(config('DATABASE_URL'))
+    'default' :dj_database_url.parse(config('DATABASE_URL'), conn_max_age=600, conn_health_checks=True)
 }
 
+# Optional read replicas, comma separated. Safe reads are spread across them by
+# core.db_router; in tests they mirror 'default' so no second server is needed.
+for i, replica_url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica{i}'] = dj_database_url.parse(replica_url, conn_max_age=600, conn_health_checks=True)
+    DATABASES[f'replica{i}']['TEST'] = {'MIRROR': 'default'}
+# Without configured replicas, tests still get a local one so routing runs end to end.
+if TESTING and len(DATABASES) == 1:
+    DATABASES['replica0'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# How long a client's reads stay on the primary after it writes; replicas
+# lagging further behind than this are skipped. The pin is kept in the default
+# cache, so replicas require REDIS_URL (see core.checks): with a per-process
+# cache, other workers would not see it.
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', default=5, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -154,13 +176,63 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttling.AnonSlidingWindowThrottle',
+        'core.throttling.UserSlidingWindowThrottle',
+        'core.throttling.ScopedSlidingWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '40/minute',
         'user': '30/minute',
+        'proxy': '20/minute',
+        'search': '30/minute',
+        'payments': '5/minute',
+        'check_in': '120/minute',
+    },
+}
+
+# Cache
+# Throttle counters (and anything else that must agree across workers) live in
+# Redis when REDIS_URL is set. Without it every process gets its own local
+# memory cache, which is what the test suite runs against.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Outbound call budgets per upstream provider, shared by every worker through
+# the cache above (see core.quota).
+UPSTREAM_QUOTAS = {
+    'ticketmaster': {
+        'per_second': config('TICKETMASTER_QUOTA_PER_SECOND', default=5, cast=int),
+        'per_day': config('TICKETMASTER_QUOTA_PER_DAY', default=5000, cast=int),
+    },
+    'predicthq': {
+        'per_second': config('PREDICTHQ_QUOTA_PER_SECOND', default=5, cast=int),
+        'per_day': config('PREDICTHQ_QUOTA_PER_DAY', default=10000, cast=int),
     },
 }
 
@@ -174,12 +246,14 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
-cloudinary.config(
-    cloud_name=config('CLOUD_NAME'),
-    api_key=config('API_KEY'),
-    api_secret=config('API_SECRET'),
-    secure=True
-)
+# Applied by core.clients.cloudinary_client() (and django-cloudinary-storage)
+# instead of configuring the SDK while settings are imported.
+CLOUDINARY_STORAGE = {
+    'CLOUD_NAME': config('CLOUD_NAME'),
+    'API_KEY': config('API_KEY'),
+    'API_SECRET': config('API_SECRET'),
+    'SECURE': True,
+}
 
 
 
@@ -194,6 +268,15 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
+# Required for the Stripe webhook: without it the endpoint answers 503 instead of
+# trusting unsigned events.
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+
+# Ticket inventory (payments.inventory): capacity is split over this many
+# rows per event, and a hold keeps tickets aside this long awaiting payment.
+TICKET_INVENTORY_SHARDS = config('TICKET_INVENTORY_SHARDS', default=8, cast=int)
+TICKET_HOLD_MINUTES = config('TICKET_HOLD_MINUTES', default=10, cast=int)
+TICKET_HOLD_MAX_QUANTITY = 10
 
 
 TICKETMASTER_API_KEY=config('TICKETMASTER_API_KEY')
@@ -206,4 +289,50 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')  # your email address
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')  # app password or email password
 
 TICKETMASTER_API_KEY = config('TICKETMASTERKEY')
-TICKETMASTER_API_URL = config('TICKETMASTERURL')
\ No newline at end of file
+TICKETMASTER_API_URL = config('TICKETMASTERURL')
+
+# Largest batch a venue gate scanner may upload in one request.
+CHECK_IN_BATCH_MAX = config('CHECK_IN_BATCH_MAX', default=1000, cast=int)
+
+# "People you may know" rows kept per user by `manage.py refresh_friend_recommendations`.
+FRIEND_RECOMMENDATIONS_PER_USER = config('FRIEND_RECOMMENDATIONS_PER_USER', default=20, cast=int)
+
+# Personalized event suggestions kept per user by `manage.py refresh_event_recommendations`.
+EVENT_RECOMMENDATIONS_PER_USER = config('EVENT_RECOMMENDATIONS_PER_USER', default=30, cast=int)
+
+# Delta sync: how long change-log entries (and so sync versions) stay valid,
+# how far behind a client may be before it gets a snapshot instead, and how
+# old an entry must be before the returned version moves past it.
+CHANGE_LOG_RETENTION_DAYS = config('CHANGE_LOG_RETENTION_DAYS', default=30, cast=int)
+SYNC_MAX_CHANGES = config('SYNC_MAX_CHANGES', default=1000, cast=int)
+SYNC_SETTLE_SECONDS = 5
+
+# Batch endpoint: sub-requests per batch, and threads running GETs concurrently.
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=4, cast=int)
+
+# Signed QR invitation codes stay valid (and their images cached) this long.
+INVITATION_TOKEN_MAX_AGE = config('INVITATION_TOKEN_MAX_AGE', default=60 * 60 * 48, cast=int)
+
+# Request profiler (core.middleware.RequestProfilerMiddleware): requests sending
+# X-Profile: <PROFILER_TOKEN>, and this share of all others, are sampled; the
+# newest PROFILER_RING_SIZE profiles are kept in PROFILER_DIR.
+PROFILER_TOKEN = config('PROFILER_TOKEN', default='')
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0.0, cast=float)
+PROFILER_DIR = config('PROFILER_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILER_RING_SIZE = config('PROFILER_RING_SIZE', default=50, cast=int)
+
+# Slow-query log (core.query_log): per-fingerprint query stats are saved every
+# QUERY_LOG_FLUSH_SECONDS, with EXPLAIN plans for queries of at least
+# QUERY_LOG_SLOW_MS, and kept QUERY_LOG_RETENTION_DAYS.
+QUERY_LOG_ENABLED = config('QUERY_LOG_ENABLED', default=True, cast=bool)
+QUERY_LOG_SLOW_MS = config('QUERY_LOG_SLOW_MS', default=100, cast=int)
+QUERY_LOG_FLUSH_SECONDS = config('QUERY_LOG_FLUSH_SECONDS', default=60, cast=int)
+QUERY_LOG_RETENTION_DAYS = config('QUERY_LOG_RETENTION_DAYS', default=7, cast=int)
+
+# Trending events: how quickly an attendance or wishlist add loses half its weight.
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=72, cast=int)
+
+# Upper bound for `manage.py import_budget`: wall time to import settings,
+# all apps and the URLconf in a fresh interpreter.
+IMPORT_TIME_BUDGET_MS = config('IMPORT_TIME_BUDGET_MS', default=1500, cast=int)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from decouple import config  # for .env
+from core.quota import SEARCH, QuotaExceeded, governed_get
 
 class EventbriteProxyView(APIView):
     permission_classes = [AllowAny]  # Allow public access from frontend
@@ -30,7 +31,7 @@ class EventbriteProxyView(APIView):
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = governed_get('predicthq', url, priority=SEARCH, headers=headers, params=params)
             
             # Debug prints:
             print("Request URL:", response.url)
@@ -39,6 +40,12 @@ class EventbriteProxyView(APIView):
 
             response.raise_for_status()  # Will raise HTTPError for bad responses
             return Response(response.json())
+        except QuotaExceeded as e:
+            return Response(
+                {'error': 'Event provider is busy, please try again shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(e.retry_after)},
+            )
         except requests.exceptions.RequestException as e:
             # Print the error details
             print("Request failed:", str(e))